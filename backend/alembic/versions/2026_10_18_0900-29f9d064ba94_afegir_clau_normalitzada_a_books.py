@@ -0,0 +1,91 @@
+"""Afegir clau normalitzada a books
+
+Revision ID: 29f9d064ba94
+Revises: 1073a1202d8d
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '29f9d064ba94'
+down_revision: Union[str, Sequence[str], None] = '1073a1202d8d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+
+def _normalize_text(text: str) -> str:
+    """Còpia congelada de `BookRepository._normalize_text` en el moment de la migració."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = unicodedata.normalize('NFC', text)
+    text = re.sub(r'[!?¿¡.,;:\(\)\[\]{}"\']+', '', text)
+    return ' '.join(text.split()).strip()
+
+
+def _backfill_normalized_keys() -> None:
+    """Omple la clau normalitzada de les files existents per lots."""
+    bind = op.get_bind()
+    books = sa.table(
+        'books',
+        sa.column('id', sa.Integer),
+        sa.column('title', sa.String),
+        sa.column('author', sa.String),
+        sa.column('normalized_key', sa.String),
+    )
+    update = (
+        books.update()
+        .where(books.c.id == sa.bindparam('book_id'))
+        .values(normalized_key=sa.bindparam('key'))
+    )
+
+    seen: set[str] = set()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.title, books.c.author)
+            .where(books.c.id > last_id)
+            .order_by(books.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        params = []
+        for book_id, title, author in rows:
+            key = f"{_normalize_text(title)}::{_normalize_text(author)}"
+            # Els duplicats antics conserven la fila però reben una clau única
+            if key in seen:
+                key = f"{key}#{book_id}"
+            seen.add(key)
+            params.append({'book_id': book_id, 'key': key})
+
+        bind.execute(update, params)
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('normalized_key', sa.VARCHAR(), nullable=True))
+    _backfill_normalized_keys()
+    op.alter_column('books', 'normalized_key',
+               existing_type=sa.VARCHAR(),
+               nullable=False)
+    op.create_index(op.f('ix_books_normalized_key'), 'books', ['normalized_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_books_normalized_key'), table_name='books')
+    op.drop_column('books', 'normalized_key')
@@ -0,0 +1,40 @@
+"""Afegir índexs de cerca local (text complet i trigrames)
+
+Revision ID: 18641e134624
+Revises: 29f9d064ba94
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '18641e134624'
+down_revision: Union[str, Sequence[str], None] = '29f9d064ba94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Ha de coincidir amb BOOK_SEARCH_VECTOR (app/models/book.py)
+    op.execute(
+        "CREATE INDEX ix_books_search_vector ON books USING gin ("
+        "to_tsvector('simple'::regconfig, "
+        "coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(description, '')))"
+    )
+    op.create_index(
+        'ix_books_title_trgm', 'books', ['title'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'title': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_title_trgm', table_name='books')
+    op.drop_index('ix_books_search_vector', table_name='books')
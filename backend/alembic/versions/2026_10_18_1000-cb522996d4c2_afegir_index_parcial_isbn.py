@@ -0,0 +1,33 @@
+"""Afegir índex parcial sobre l'ISBN dels llibres
+
+Revision ID: cb522996d4c2
+Revises: 18641e134624
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cb522996d4c2'
+down_revision: Union[str, Sequence[str], None] = '18641e134624'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Els llibres sense ISBN es desen amb el valor de relleu 'Sense ISBN'
+    op.create_index(
+        'ix_books_isbn', 'books', ['isbn'],
+        unique=False,
+        postgresql_where=sa.text("isbn <> 'Sense ISBN'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_isbn', table_name='books')
@@ -0,0 +1,32 @@
+"""Afegir índexs per al llistat paginat de llibres
+
+Revision ID: e5837006efe0
+Revises: cb522996d4c2
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5837006efe0'
+down_revision: Union[str, Sequence[str], None] = 'cb522996d4c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Paginació per clau: cada pàgina és un salt directe dins de l'índex
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'], unique=False)
+    op.create_index('ix_books_language_id', 'books', ['language', 'id'], unique=False)
+    op.create_index('ix_books_author_id', 'books', ['author', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_author_id', table_name='books')
+    op.drop_index('ix_books_language_id', table_name='books')
+    op.drop_index('ix_books_title_id', table_name='books')
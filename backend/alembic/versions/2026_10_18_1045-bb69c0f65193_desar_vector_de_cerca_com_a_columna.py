@@ -0,0 +1,45 @@
+"""Desar el vector de cerca com a columna generada
+
+Revision ID: bb69c0f65193
+Revises: e5837006efe0
+Create Date: 2026-10-18 10:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb69c0f65193'
+down_revision: Union[str, Sequence[str], None] = 'e5837006efe0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ha de coincidir amb la columna search_vector (app/models/book.py)
+SEARCH_DOCUMENT = (
+    "to_tsvector('simple'::regconfig, "
+    "coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || coalesce(description, ''))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Reescriu la taula una vegada per calcular el vector de totes les files
+    op.execute(
+        f"ALTER TABLE books ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_DOCUMENT}) STORED"
+    )
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.create_index(
+        'ix_books_search_vector', 'books', ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_search_vector', table_name='books')
+    op.drop_column('books', 'search_vector')
+    op.execute(f"CREATE INDEX ix_books_search_vector ON books USING gin ({SEARCH_DOCUMENT})")
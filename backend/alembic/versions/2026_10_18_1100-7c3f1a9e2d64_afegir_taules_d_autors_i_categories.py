@@ -0,0 +1,163 @@
+"""Afegir taules d'autors i categories
+
+Revision ID: 7c3f1a9e2d64
+Revises: bb69c0f65193
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3f1a9e2d64'
+down_revision: Union[str, Sequence[str], None] = 'bb69c0f65193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# Faceta -> (taula, taula d'unió, columna de la faceta, columna de books)
+FACETS = {
+    'authors': ('authors', 'book_authors', 'author_id', 'author'),
+    'categories': ('categories', 'book_categories', 'category_id', 'categories'),
+}
+
+_PUNCTUATION = re.compile(r'[!?¿¡.,;:\(\)\[\]{}"\']+')
+
+
+def _normalize_text(text: str) -> str:
+    """Còpia congelada de `app.core.normalize.normalize_text` en el moment de la migració."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = unicodedata.normalize('NFC', text)
+    return ' '.join(_PUNCTUATION.sub('', text).split())
+
+
+def _split_names(value: str | None) -> list[str]:
+    """Còpia congelada de `app.core.normalize.split_names`."""
+    if not value:
+        return []
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+def _create_facet_tables(table: str, link_table: str, link_column: str) -> None:
+    op.create_table(
+        table,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.VARCHAR(), nullable=False),
+        sa.Column('normalized_name', sa.VARCHAR(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(
+        f'ix_{table}_normalized_name', table, ['normalized_name'], unique=True,
+        postgresql_ops={'normalized_name': 'text_pattern_ops'},
+    )
+    op.create_table(
+        link_table,
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column(link_column, sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([link_column], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id', link_column),
+    )
+    op.create_index(
+        f'ix_{link_table}_{link_column}_book_id', link_table, [link_column, 'book_id'],
+    )
+
+
+def _backfill_facets() -> None:
+    """Crea els autors i les categories dels llibres existents i els enllaça, per lots."""
+    bind = op.get_bind()
+    books = sa.table(
+        'books',
+        sa.column('id', sa.Integer),
+        sa.column('author', sa.String),
+        sa.column('categories', sa.String),
+    )
+    statements = {}
+    for facet, (table, link_table, link_column, _) in FACETS.items():
+        statements[facet] = (
+            sa.text(
+                f"INSERT INTO {table} (name, normalized_name) "
+                f"SELECT * FROM unnest(:names, :name_keys) AS new(name, normalized_name) "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.normalized_name = new.normalized_name) "
+                f"ON CONFLICT (normalized_name) DO NOTHING"
+            ).bindparams(
+                sa.bindparam('names', type_=postgresql.ARRAY(sa.String)),
+                sa.bindparam('name_keys', type_=postgresql.ARRAY(sa.String)),
+            ),
+            sa.text(
+                f"INSERT INTO {link_table} (book_id, {link_column}, position) "
+                f"SELECT link.book_id, facet.id, link.position "
+                f"FROM unnest(:book_ids, :keys, :positions) AS link(book_id, normalized_name, position) "
+                f"JOIN {table} AS facet USING (normalized_name) "
+                f"ON CONFLICT DO NOTHING"
+            ).bindparams(
+                sa.bindparam('book_ids', type_=postgresql.ARRAY(sa.Integer)),
+                sa.bindparam('keys', type_=postgresql.ARRAY(sa.String)),
+                sa.bindparam('positions', type_=postgresql.ARRAY(sa.Integer)),
+            ),
+        )
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(books.c.id, books.c.author, books.c.categories)
+            .where(books.c.id > last_id)
+            .order_by(books.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        for facet, (_, _, _, column) in FACETS.items():
+            names: dict[str, str] = {}
+            book_ids, keys, positions = [], [], []
+            for row in rows:
+                seen: set[str] = set()
+                for position, name in enumerate(_split_names(getattr(row, column))):
+                    key = _normalize_text(name)
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    names.setdefault(key, name)
+                    book_ids.append(row.id)
+                    keys.append(key)
+                    positions.append(position)
+            if not keys:
+                continue
+            name_keys = sorted(names)
+            names_statement, links_statement = statements[facet]
+            bind.execute(names_statement, {
+                'names': [names[key] for key in name_keys], 'name_keys': name_keys,
+            })
+            bind.execute(links_statement, {
+                'book_ids': book_ids, 'keys': keys, 'positions': positions,
+            })
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, link_table, link_column, _ in FACETS.values():
+        _create_facet_tables(table, link_table, link_column)
+    _backfill_facets()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, link_table, link_column, _ in FACETS.values():
+        op.drop_index(f'ix_{link_table}_{link_column}_book_id', table_name=link_table)
+        op.drop_table(link_table)
+        op.drop_index(f'ix_{table}_normalized_name', table_name=table)
+        op.drop_table(table)
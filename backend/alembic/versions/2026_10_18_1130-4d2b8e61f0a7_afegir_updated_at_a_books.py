@@ -0,0 +1,32 @@
+"""Afegir updated_at a books
+
+Revision ID: 4d2b8e61f0a7
+Revises: 7c3f1a9e2d64
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d2b8e61f0a7'
+down_revision: Union[str, Sequence[str], None] = '7c3f1a9e2d64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # now() és estable dins la transacció: PostgreSQL afegeix la columna sense
+    # reescriure la taula i les files existents reben l'hora de la migració
+    op.add_column('books', sa.Column(
+        'updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False,
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('books', 'updated_at')
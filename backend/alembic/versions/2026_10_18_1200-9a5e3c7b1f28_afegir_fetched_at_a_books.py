@@ -0,0 +1,40 @@
+"""Afegir fetched_at a books
+
+Revision ID: 9a5e3c7b1f28
+Revises: 4d2b8e61f0a7
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a5e3c7b1f28'
+down_revision: Union[str, Sequence[str], None] = '4d2b8e61f0a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Amb un valor per defecte constant PostgreSQL no reescriu la taula: les
+    # files existents queden amb l'època Unix (mai refrescades) i passen
+    # primer. Després, les noves reben l'hora d'inserció
+    op.add_column('books', sa.Column(
+        'fetched_at', sa.DateTime(timezone=True),
+        server_default=sa.text("'1970-01-01 00:00:00+00'::timestamptz"), nullable=False,
+    ))
+    op.alter_column('books', 'fetched_at', server_default=sa.text('now()'))
+    op.create_index(
+        'ix_books_fetched_at', 'books', ['fetched_at'], unique=False,
+        postgresql_where=sa.text("isbn <> 'Sense ISBN'"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_fetched_at', table_name='books')
+    op.drop_column('books', 'fetched_at')
@@ -0,0 +1,24 @@
+"""Dependències compartides pels endpoints de l'API."""
+
+from fastapi import Depends
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.clients import GoogleBooksClient, get_google_books_client, get_thumbnail_cache
+from app.core.db import get_session
+from app.crud import AsyncBookRepository
+from app.services import BookService, CatalogService
+from app.services.write_behind import get_write_behind_queue
+
+
+def get_book_service(
+    db: AsyncSession = Depends(get_session),
+    google_client: GoogleBooksClient = Depends(get_google_books_client),
+) -> BookService:
+    """Obté el servei de llibres amb el repositori i el client injectats."""
+    repo = AsyncBookRepository(db)
+    return BookService(repo, google_client, get_write_behind_queue(), get_thumbnail_cache())
+
+
+def get_catalog_service(db: AsyncSession = Depends(get_session)) -> CatalogService:
+    """Obté el servei d'exportació i importació del catàleg."""
+    return CatalogService(AsyncBookRepository(db))
@@ -1,6 +1,7 @@
 """Paquet de gestors d'endpoints de l'API v1."""
 
-from .google import router
-
-__all__ = ["router"]
+from .books import router as books_router
+from .facets import router as facets_router
+from .google import router as google_router
 
+__all__ = ["books_router", "facets_router", "google_router"]
@@ -0,0 +1,175 @@
+"""Endpoints de l'API per als llibres desats."""
+
+from typing import Literal
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.api.deps import get_book_service, get_catalog_service
+from app.core.config import settings
+from app.core.http_cache import etag_matches, make_etag, not_modified
+from app.schemas import BookPage, BookResponse, BookSearchResponse, IsbnBatchRequest
+from app.services import BookService, CatalogService
+from app.services.catalog_service import CatalogFormat, InvalidImportFile
+
+router = APIRouter()
+
+CATALOG_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+@router.get("", response_model=BookPage)
+async def list_books(
+    request: Request,
+    response: Response,
+    sort: Literal["id", "title"] = Query("id", description="Ordenació: per id o per títol"),
+    limit: int = Query(50, ge=1, le=200, description="Llibres per pàgina"),
+    cursor: str | None = Query(None, description="Cursor `next_cursor` de la pàgina anterior"),
+    fields: str | None = Query(
+        None, description="Camps a retornar separats per comes (l'id i updated_at s'inclouen sempre)"
+    ),
+    language: str | None = Query(None, description="Filtra per idioma exacte"),
+    categories: str | None = Query(None, description="Filtra per categoria (part del nom, sense accents ni majúscules)"),
+    author: str | None = Query(None, description="Filtra per autor exacte"),
+    author_id: int | None = Query(None, description="Filtra per autor (id de /authors)"),
+    category_id: int | None = Query(None, description="Filtra per categoria (id de /categories)"),
+    service: BookService = Depends(get_book_service),
+) -> BookPage | Response:
+    """
+    Llista els llibres desats amb paginació per cursor.
+
+    Per obtenir la pàgina següent cal passar el `next_cursor` de la resposta
+    amb la mateixa ordenació; és `null` a l'última pàgina. L'ETag depèn dels
+    ids i les dates de modificació de la pàgina.
+    """
+    page = await service.list_books(
+        sort=sort,
+        limit=limit,
+        cursor=cursor,
+        fields=[name.strip() for name in fields.split(",") if name.strip()] if fields else None,
+        language=language,
+        categories=categories,
+        author=author,
+        author_id=author_id,
+        category_id=category_id,
+    )
+    etag = make_etag(page.next_cursor, [(book["id"], book["updated_at"]) for book in page.books])
+    return not_modified(request, response, etag) or page
+
+
+@router.get("/search", response_model=BookSearchResponse)
+async def search_books(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description="Text a cercar (títol, autor o descripció)"),
+    source: Literal["auto", "local", "google"] = Query(
+        "auto", description="Origen de la cerca: primer la BD (auto), només BD o només Google"
+    ),
+    limit: int = Query(10, ge=1, le=40, description="Nombre màxim de resultats"),
+    service: BookService = Depends(get_book_service),
+) -> BookSearchResponse | Response:
+    """
+    Cerca llibres primer a la base de dades i, si no n'hi ha prou, a Google Books.
+
+    Només porta ETag quan tots els llibres estan desats (amb `id`). Les
+    peticions a Google tenen prioritat alta davant de la quota.
+    """
+    result = await service.search(q, source=source, limit=limit, priority="high")
+    if all(book.id is not None for book in result.books):
+        etag = make_etag(result.source, [(book.id, book.updated_at) for book in result.books])
+        return not_modified(request, response, etag) or result
+    return result
+
+
+@router.post("/isbn-batch", response_class=StreamingResponse)
+async def lookup_isbn_batch(
+    request: IsbnBatchRequest,
+    service: BookService = Depends(get_book_service),
+) -> StreamingResponse:
+    """
+    Resol una llista d'ISBN i retorna una línia NDJSON per ISBN a mesura que es resolen.
+
+    Cada línia té `isbn`, `status` (`found`, `fetched`, `not_found`,
+    `invalid` o `error`) i `book`.
+    """
+    async def ndjson():
+        async for line in service.lookup_isbns(request.isbns, priority="normal"):
+            yield orjson.dumps(line, option=orjson.OPT_APPEND_NEWLINE)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_catalog(
+    format: CatalogFormat = Query("ndjson", description="Format de sortida"),
+    service: CatalogService = Depends(get_catalog_service),
+) -> StreamingResponse:
+    """
+    Exporta tot el catàleg en streaming (NDJSON amb cursor de servidor o CSV amb COPY).
+    """
+    return StreamingResponse(
+        service.export(format),
+        media_type=CATALOG_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"'},
+    )
+
+
+@router.post("/import")
+async def import_catalog(
+    request: Request,
+    format: CatalogFormat = Query("ndjson", description="Format del cos de la petició"),
+    service: CatalogService = Depends(get_catalog_service),
+) -> dict:
+    """
+    Importa un catàleg NDJSON o CSV enviat com a cos de la petició.
+
+    El cos es parseja a mesura que arriba; les files es carreguen amb COPY
+    a una taula temporal i es fusionen per la clau títol+autor normalitzada.
+    """
+    try:
+        return await service.import_stream(request.stream(), format)
+    except InvalidImportFile as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{book_id}/thumbnail", response_class=FileResponse)
+async def get_thumbnail(
+    book_id: int,
+    request: Request,
+    size: Literal["thumbnail", "small_thumbnail"] = Query(
+        "thumbnail", description="Mida de la miniatura de Google"
+    ),
+    service: BookService = Depends(get_book_service),
+) -> Response:
+    """
+    Serveix la miniatura d'un llibre des de la cache local en lloc de Google.
+
+    L'ETag és el hash del contingut: amb `If-None-Match` es respon 304 sense cos.
+    """
+    image = await service.get_thumbnail(book_id, size)
+    headers = {
+        "ETag": f'"{image.digest}"',
+        "Cache-Control": f"public, max-age={settings.thumbnail_max_age_seconds}",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        image.path, media_type=image.media_type, headers=headers, stat_result=image.stat
+    )
+
+
+@router.get("/{book_id}", response_model=BookResponse)
+async def get_book(
+    book_id: int,
+    request: Request,
+    response: Response,
+    service: BookService = Depends(get_book_service),
+) -> BookResponse | Response:
+    """
+    Retorna un llibre desat, amb `ETag` i `Last-Modified` per a peticions condicionals.
+    """
+    book = await service.get_book(book_id)
+    return (
+        not_modified(request, response, make_etag(book.id, book.updated_at), book.updated_at)
+        or BookResponse.model_validate(book)
+    )
@@ -0,0 +1,33 @@
+"""Endpoints de l'API per als autors i les categories dels llibres desats."""
+
+from fastapi import APIRouter, Query, Depends
+
+from app.api.deps import get_book_service
+from app.schemas import FacetCount
+from app.services import BookService
+
+router = APIRouter()
+
+
+@router.get("/authors", response_model=list[FacetCount])
+async def list_authors(
+    q: str | None = Query(None, description="Inici del nom (sense distingir accents ni majúscules)"),
+    limit: int = Query(50, ge=1, le=200, description="Nombre màxim d'autors"),
+    service: BookService = Depends(get_book_service),
+) -> list[FacetCount]:
+    """
+    Llista els autors amb més llibres; l'`id` serveix per filtrar `/books?author_id=`.
+    """
+    return await service.list_facets("authors", q, limit)
+
+
+@router.get("/categories", response_model=list[FacetCount])
+async def list_categories(
+    q: str | None = Query(None, description="Inici del nom (sense distingir accents ni majúscules)"),
+    limit: int = Query(50, ge=1, le=200, description="Nombre màxim de categories"),
+    service: BookService = Depends(get_book_service),
+) -> list[FacetCount]:
+    """
+    Llista les categories amb més llibres; l'`id` serveix per filtrar `/books?category_id=`.
+    """
+    return await service.list_facets("categories", q, limit)
@@ -1,27 +1,62 @@
 """Endpoints de l'API per a Google Books."""
 
 from fastapi import APIRouter, Query, Depends
-from sqlmodel import Session
 
-from app.core.db import get_session
-from app.crud import BookRepository
+from app.api.deps import get_book_service
+from app.clients import GoogleBooksClient, get_google_books_client
 from app.schemas import BookResponse
 from app.services import BookService
 
 router = APIRouter()
 
-def get_book_service(db: Session = Depends(get_session)) -> BookService:
-    """Obté el servei de llibres amb el repositori injectat."""
-    repo = BookRepository(db)
-    return BookService(repo)
-
 @router.get("/search-by-title", response_model=list[BookResponse])
 async def search_by_title(
     title: str = Query(..., description="Títol del llibre a cercar"),
+    max_results: int = Query(10, ge=1, le=200, description="Nombre màxim de resultats"),
     service: BookService = Depends(get_book_service),
 ) -> list[BookResponse]:
     """
     Cerca llibres per títol.
+
+    És una cerca interactiva: té prioritat alta davant de la quota de Google.
+    """
+    # FastAPI valida i serialitza la resposta una sola vegada amb `response_model`
+    return await service.search_and_process(title, max_results, priority="high")
+
+
+@router.post("/import")
+async def import_by_query(
+    q: str = Query(..., description="Consulta de Google Books a importar"),
+    max_results: int = Query(200, ge=1, le=1000, description="Nombre màxim de llibres"),
+    service: BookService = Depends(get_book_service),
+) -> dict:
+    """
+    Importa molts resultats de Google desant-los pàgina a pàgina.
+    """
+    return await service.import_from_google(q, max_results, priority="normal")
+
+
+@router.get("/cache-stats")
+async def cache_stats(
+    google_client: GoogleBooksClient = Depends(get_google_books_client),
+) -> dict:
+    """
+    Comptadors d'encerts i errors de la cache de cerques i crides agrupades.
+    """
+    return {
+        **google_client.cache.stats(),
+        "single_flight": google_client.single_flight.stats(),
+    }
+
+
+@router.get("/upstream-status")
+async def upstream_status(
+    google_client: GoogleBooksClient = Depends(get_google_books_client),
+) -> dict:
+    """
+    Estat del circuit breaker i del limitador de quota de Google Books.
     """
-    books = await service.search_and_process(title)
-    return [BookResponse.model_validate(book) for book in books]
+    return {
+        **google_client.breaker.stats(),
+        "rate_limit": google_client.rate_limiter.stats(),
+    }
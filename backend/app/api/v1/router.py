@@ -1,8 +1,10 @@
 """Rutes principals de l'API."""
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import router as google_router
+from app.api.v1.endpoints import books_router, facets_router, google_router
 
 api_router = APIRouter()
 
 api_router.include_router(google_router, prefix="/google", tags=["Google Books API"])
+api_router.include_router(books_router, prefix="/books", tags=["Books"])
+api_router.include_router(facets_router, tags=["Facets"])
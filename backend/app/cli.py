@@ -0,0 +1,191 @@
+"""Línia d'ordres per a tasques de manteniment del catàleg.
+
+Ús:
+    python -m app.cli export --format csv --output books.csv
+    python -m app.cli import books.ndjson --format ndjson
+    python -m app.cli migrate
+    python -m app.cli dedup --output duplicates.ndjson --workers 4
+    python -m app.cli refresh --max-age-days 30 --follow
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import timedelta
+
+from app.clients import get_google_books_client
+from app.clients.rate_limit import get_refresh_rate_limiter
+from app.core.config import settings
+from app.core.db import async_engine, async_session_maker, migrate_database
+from app.crud import AsyncBookRepository
+from app.services import CatalogService
+from app.services.catalog_service import InvalidImportFile
+from app.services.dedup import DuplicateFinder
+from app.services.refresh import MetadataRefresher
+
+
+async def export_catalog(fmt: str, output: str) -> None:
+    """Escriu el catàleg al fitxer indicat (o a stdout amb `-`)."""
+    started = time.perf_counter()
+    written = 0
+    stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+    try:
+        async with async_session_maker() as session:
+            service = CatalogService(AsyncBookRepository(session))
+            async for chunk in service.export(fmt):
+                stream.write(chunk)
+                written += len(chunk)
+    finally:
+        if stream is not sys.stdout.buffer:
+            stream.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"Exportats {written / 1e6:.1f} MB en {elapsed:.1f}s ({written / 1e6 / elapsed:.1f} MB/s)",
+        file=sys.stderr,
+    )
+
+
+async def import_catalog(fmt: str, path: str) -> None:
+    """Importa el fitxer indicat i mostra els comptadors en JSON."""
+    started = time.perf_counter()
+    with open(path, "rb") as file:
+        async with async_session_maker() as session:
+            service = CatalogService(AsyncBookRepository(session))
+            try:
+                result = await service.import_file(file, fmt)
+            except InvalidImportFile as e:
+                sys.exit(f"No s'ha importat res: {e}")
+    elapsed = time.perf_counter() - started
+    result["seconds"] = round(elapsed, 2)
+    result["rows_per_second"] = round(result["received"] / elapsed) if elapsed else None
+    print(json.dumps(result))
+
+
+async def find_duplicates(args: argparse.Namespace) -> None:
+    """Cerca grups de duplicats, n'escriu l'informe i mostra els comptadors en JSON."""
+    finder = DuplicateFinder(
+        threshold=args.threshold,
+        num_perm=args.num_perm,
+        rows_per_band=args.rows_per_band,
+        max_bucket=args.max_bucket,
+        workers=args.workers,
+    )
+    timings = {}
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        repo = AsyncBookRepository(session)
+        await finder.scan(repo)
+        timings["scan_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        finder.match()
+        timings["match_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        stream = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            await finder.write_report(repo, stream)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        timings["report_seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps({**finder.summary(), **timings}), file=sys.stderr)
+
+
+async def refresh_metadata(args: argparse.Namespace) -> None:
+    """Torna a demanar a Google els llibres obsolets i mostra els comptadors en JSON."""
+    google_client = get_google_books_client()
+    started = time.perf_counter()
+    try:
+        async with async_session_maker() as session:
+            refresher = MetadataRefresher(
+                AsyncBookRepository(session),
+                google_client,
+                get_refresh_rate_limiter(),
+                max_age=timedelta(days=args.max_age_days),
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+            )
+            result = await refresher.run(
+                max_batches=args.max_batches,
+                follow=args.follow,
+                idle_seconds=settings.refresh_idle_seconds,
+            )
+    finally:
+        await google_client.close()
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(result))
+
+
+async def _run(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "export":
+            await export_catalog(args.format, args.output)
+        elif args.command == "import":
+            await import_catalog(args.format, args.path)
+        elif args.command == "dedup":
+            await find_duplicates(args)
+        elif args.command == "refresh":
+            await refresh_metadata(args)
+    finally:
+        await async_engine.dispose()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Exporta el catàleg en streaming")
+    export.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export.add_argument("--output", "-o", default="-", help="Fitxer de sortida (- per stdout)")
+
+    import_ = commands.add_parser("import", help="Importa un catàleg NDJSON o CSV")
+    import_.add_argument("path", help="Fitxer a importar")
+    import_.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+
+    commands.add_parser(
+        "migrate", help="Crea o actualitza l'esquema (un sol cop abans d'arrencar els workers)"
+    )
+
+    dedup = commands.add_parser(
+        "dedup", help="Cerca llibres duplicats (ISBN, títol i semblança) i n'escriu un informe"
+    )
+    dedup.add_argument("--output", "-o", default="-", help="Informe NDJSON (- per stdout)")
+    dedup.add_argument("--workers", type=int, help="Processos per calcular signatures (per defecte, un per nucli)")
+    dedup.add_argument("--threshold", type=float, default=0.7, help="Semblança mínima (Jaccard estimat)")
+    dedup.add_argument("--num-perm", type=int, default=32, help="Mida de la signatura MinHash")
+    dedup.add_argument("--rows-per-band", type=int, default=4, help="Files per banda LSH")
+    dedup.add_argument("--max-bucket", type=int, default=200, help="Mida màxima d'un grup de candidats LSH")
+
+    refresh = commands.add_parser(
+        "refresh",
+        help="Torna a demanar a Google els llibres obsolets (es poden executar diversos processos alhora)",
+    )
+    refresh.add_argument(
+        "--max-age-days", type=float, default=settings.refresh_max_age_days,
+        help="Antiguitat a partir de la qual un llibre és obsolet",
+    )
+    refresh.add_argument("--batch-size", type=int, default=settings.refresh_batch_size, help="Llibres per lot")
+    refresh.add_argument(
+        "--concurrency", type=int, default=settings.refresh_concurrency, help="Peticions simultànies a Google"
+    )
+    refresh.add_argument("--max-batches", type=int, help="Lots màxims a processar (per defecte, tots)")
+    refresh.add_argument(
+        "--follow", action="store_true", help="No s'atura: espera nous llibres obsolets (mode worker)"
+    )
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    if args.command == "migrate":
+        print(f"Esquema de la base de dades: {migrate_database()}", file=sys.stderr)
+        return
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
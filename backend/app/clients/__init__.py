@@ -1,5 +1,6 @@
 """Paquet de clients per a APIs externes."""
 
 from .google_client import GoogleBooksClient, get_google_books_client
+from .thumbnail_cache import ThumbnailCache, get_thumbnail_cache
 
-__all__ = ["GoogleBooksClient", "get_google_books_client"]
+__all__ = ["GoogleBooksClient", "ThumbnailCache", "get_google_books_client", "get_thumbnail_cache"]
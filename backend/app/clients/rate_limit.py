@@ -0,0 +1,203 @@
+"""Limitador de peticions (token bucket) per a la quota de Google Books."""
+
+import asyncio
+import fcntl
+import json
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+
+from app.core.config import settings
+
+# Fracció de l'espera màxima que accepta cada prioritat: les peticions
+# de prioritat baixa es descarten si no hi ha cap token disponible
+PRIORITY_WAIT_FACTORS = {"high": 2.0, "normal": 1.0, "low": 0.0}
+
+
+class RateLimitExceeded(Exception):
+    """No hi ha quota disponible dins del temps d'espera permès."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Quota de Google Books exhaurida, torna-ho a provar en {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+def reserve_token(
+    tokens: float, updated_at: float, now: float, rate: float, burst: float, max_wait: float
+) -> tuple[float | None, float]:
+    """
+    Reserva un token i retorna `(tokens_restants, espera)`.
+
+    Els tokens poden quedar en negatiu: cada reserva posterior espera el
+    seu torn, de manera que les peticions surten a ritme `rate` en ordre
+    d'arribada. Si l'espera superaria `max_wait` no es reserva res:
+    `tokens_restants` és None i l'espera és la de la cua acumulada.
+    """
+    tokens = min(burst, tokens + (now - updated_at) * rate) - 1
+    wait = -tokens / rate if tokens < 0 else 0.0
+    if wait > max_wait:
+        return None, wait
+    return tokens, wait
+
+
+class RateLimiter(ABC):
+    """Interfície comuna dels limitadors amb comptadors."""
+
+    name = "base"
+
+    def __init__(self, rate: float, burst: float, max_wait: float):
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.acquired = 0
+        self.shed = 0
+
+    async def acquire(self, priority: str = "normal") -> None:
+        """Espera el torn de la petició o llança RateLimitExceeded."""
+        max_wait = self.max_wait * PRIORITY_WAIT_FACTORS[priority]
+        reserved, wait = await self._reserve(max_wait)
+        if not reserved:
+            self.shed += 1
+            # Quan la cua actual s'hagi buidat hi tornarà a haver un token
+            raise RateLimitExceeded(retry_after=wait)
+        self.acquired += 1
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    @abstractmethod
+    async def _reserve(self, max_wait: float) -> tuple[bool, float]:
+        """
+        Reserva un token i retorna `(reservat, espera)`.
+
+        Si l'espera superaria `max_wait` no es reserva i es retorna l'espera
+        refusada, que és la que s'indica al client a `Retry-After`.
+        """
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "shed": self.shed,
+        }
+
+
+class NullRateLimiter(RateLimiter):
+    """Limitador desactivat."""
+
+    name = "none"
+
+    def __init__(self):
+        super().__init__(rate=0, burst=0, max_wait=0)
+
+    async def acquire(self, priority: str = "normal") -> None:
+        self.acquired += 1
+
+    async def _reserve(self, max_wait: float) -> tuple[bool, float]:
+        return True, 0.0
+
+
+class TokenBucket(RateLimiter):
+    """Token bucket per procés."""
+
+    name = "memory"
+
+    def __init__(self, rate: float, burst: float, max_wait: float):
+        super().__init__(rate, burst, max_wait)
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+
+    async def _reserve(self, max_wait: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, wait = reserve_token(
+            self._tokens, self._updated_at, now, self.rate, self.burst, max_wait
+        )
+        if tokens is None:
+            return False, wait
+        self._tokens = tokens
+        self._updated_at = now
+        return True, wait
+
+
+class FileTokenBucket(RateLimiter):
+    """
+    Token bucket compartit entre processos a través d'un fitxer amb `flock`.
+
+    Tots els workers d'uvicorn de la màquina (o els que comparteixin el
+    sistema de fitxers) consumeixen de la mateixa quota.
+    """
+
+    name = "file"
+
+    def __init__(self, path: str, rate: float, burst: float, max_wait: float):
+        super().__init__(rate, burst, max_wait)
+        self.path = path
+
+    def _reserve_locked(self, max_wait: float) -> tuple[bool, float]:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with os.fdopen(fd, "r+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            now = time.time()
+            try:
+                state = json.loads(state_file.read() or "{}")
+            except ValueError:
+                state = {}
+            tokens, wait = reserve_token(
+                state.get("tokens", self.burst),
+                state.get("updated_at", now),
+                now,
+                self.rate,
+                self.burst,
+                max_wait,
+            )
+            if tokens is None:
+                return False, wait
+            state_file.seek(0)
+            state_file.truncate()
+            state_file.write(json.dumps({"tokens": tokens, "updated_at": now}))
+            return True, wait
+
+    async def _reserve(self, max_wait: float) -> tuple[bool, float]:
+        return await asyncio.to_thread(self._reserve_locked, max_wait)
+
+
+@lru_cache()
+def get_rate_limiter() -> RateLimiter:
+    """
+    Factory function que construeix el limitador segons la configuració.
+
+    Returns:
+        Limitador compartit per a aquest procés
+    """
+    rate = settings.google_rate_limit_per_second
+    if not rate:
+        return NullRateLimiter()
+
+    burst = settings.google_rate_limit_burst or rate
+    max_wait = settings.google_rate_limit_max_wait_seconds
+    if settings.google_rate_limit_backend == "file":
+        return FileTokenBucket(settings.google_rate_limit_file_path, rate, burst, max_wait)
+    return TokenBucket(rate, burst, max_wait)
+
+
+@lru_cache()
+def get_refresh_rate_limiter() -> RateLimiter:
+    """
+    Factory function del pressupost de peticions del refresc de metadades.
+
+    L'espera no té límit: el refresc no té pressa, només ha de sortir al
+    ritme configurat.
+
+    Returns:
+        Limitador compartit per a aquest procés
+    """
+    rate = settings.refresh_rate_limit_per_second
+    if not rate:
+        return NullRateLimiter()
+
+    if settings.google_rate_limit_backend == "file":
+        return FileTokenBucket(settings.refresh_rate_limit_file_path, rate, rate, math.inf)
+    return TokenBucket(rate, rate, math.inf)
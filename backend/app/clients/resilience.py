@@ -0,0 +1,104 @@
+"""Reintents amb backoff i circuit breaker per a APIs externes."""
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class CircuitOpenError(Exception):
+    """L'API externa es considera caiguda i la petició no s'ha enviat."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estats (tancat, obert, semiobert).
+
+    Després de `failure_threshold` errors consecutius s'obre i rebutja les
+    peticions durant `reset_timeout` segons. Llavors deixa passar una sola
+    petició de prova: si va bé es tanca i, si falla, es torna a obrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        """Indica si es pot enviar una petició a l'API externa."""
+        if self.state == self.CLOSED:
+            return True
+        # Obert o semiobert: una sola prova cada `reset_timeout` segons
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        """L'API ha respost: es tanca el circuit."""
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """L'API ha fallat després dels reintents."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        """Estat actual del circuit."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+class RetryPolicy:
+    """Reintents amb backoff exponencial i jitter complet."""
+
+    RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_retries: int, backoff_base: float, backoff_max: float):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def should_retry(self, status_code: int) -> bool:
+        """Només es reintenten els límits de quota i els errors del servidor."""
+        return status_code in self.RETRY_STATUS_CODES
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """Segons d'espera abans del reintent `attempt` (començant per 0)."""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Interpreta la capçalera Retry-After (segons o data HTTP)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
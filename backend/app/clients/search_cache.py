@@ -0,0 +1,318 @@
+"""Cache de respostes de cerca de Google Books (LRU en memòria i SQLite compartit)."""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing
+from functools import lru_cache
+
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.schemas import BookBase
+
+# (De)serialització JSON de les llistes de llibres en una sola passada de pydantic-core
+_BOOK_LIST = TypeAdapter(list[BookBase])
+
+
+class SearchCache(ABC):
+    """Interfície comuna dels backends de cache amb comptadors d'encerts."""
+
+    name = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    @staticmethod
+    def make_key(query: str, max_results: int) -> str:
+        """Clau a partir de la consulta normalitzada i el nombre de resultats."""
+        return f"{' '.join(query.casefold().split())}|{max_results}"
+
+    async def get(self, key: str) -> list[BookBase] | None:
+        """Retorna els llibres en cache o None, actualitzant els comptadors."""
+        books = await self._get(key)
+        if books is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return books
+
+    async def get_stale(self, key: str) -> list[BookBase] | None:
+        """
+        Retorna una entrada encara que hagi caducat (dins del marge de
+        `stale_seconds`). S'utilitza quan Google no està disponible.
+        """
+        books = await self._get_stale(key)
+        if books is not None:
+            self.stale_hits += 1
+        return books
+
+    @abstractmethod
+    async def _get(self, key: str) -> list[BookBase] | None:
+        """Lectura específica del backend."""
+
+    async def _get_stale(self, key: str) -> list[BookBase] | None:
+        """Lectura ignorant la caducitat; per defecte no n'hi ha."""
+        return None
+
+    @abstractmethod
+    async def set(self, key: str, books: list[BookBase]) -> None:
+        """Desa els llibres amb el TTL configurat."""
+
+    def stats(self) -> dict:
+        """Comptadors d'encerts i errors de la cache."""
+        total = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "stale_hits": self.stale_hits,
+        }
+
+
+class NullSearchCache(SearchCache):
+    """Cache desactivada: totes les consultes van a Google."""
+
+    name = "none"
+
+    async def _get(self, key: str) -> list[BookBase] | None:
+        return None
+
+    async def set(self, key: str, books: list[BookBase]) -> None:
+        return None
+
+
+class InMemorySearchCache(SearchCache):
+    """Cache LRU per procés amb TTL i límit d'entrades."""
+
+    name = "memory"
+
+    def __init__(self, ttl_seconds: float, max_entries: int, stale_seconds: float = 0):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._entries: OrderedDict[str, tuple[float, list[BookBase]]] = OrderedDict()
+
+    async def _get(self, key: str) -> list[BookBase] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, books = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            # Es conserva com a entrada obsoleta fins que passi el marge
+            if expires_at + self.stale_seconds <= now:
+                del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return list(books)
+
+    async def _get_stale(self, key: str) -> list[BookBase] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, books = entry
+        if expires_at + self.stale_seconds <= time.monotonic():
+            return None
+        return list(books)
+
+    async def set(self, key: str, books: list[BookBase]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, list(books))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "entries": len(self._entries)}
+
+
+class SQLiteSearchCache(SearchCache):
+    """
+    Cache compartida entre workers d'uvicorn a través d'un fitxer SQLite.
+
+    Cada fil de l'executor reutilitza la seva connexió. Les lectures
+    actualitzen `accessed_at` (com a molt un cop cada `ACCESS_RESOLUTION`
+    segons per entrada) i la neteja periòdica esborra les entrades caducades
+    i, si en sobren, les menys usades (LRU). Entre neteges la taula pot
+    superar `max_entries` amb les escriptures d'un interval.
+    """
+
+    name = "sqlite"
+
+    # Precisió de `accessed_at`: evita una escriptura a cada lectura
+    ACCESS_RESOLUTION = 60.0
+    # Interval mínim entre neteges (per procés)
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(
+        self, path: str, ttl_seconds: float, max_entries: int, stale_seconds: float = 0
+    ):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        with closing(sqlite3.connect(self.path, timeout=5.0)) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload TEXT NOT NULL,"
+                " accessed_at REAL NOT NULL DEFAULT 0)"
+            )
+            # Fitxers creats abans que la cache fos LRU
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(search_cache)")}
+            if "accessed_at" not in columns:
+                conn.execute(
+                    "ALTER TABLE search_cache ADD COLUMN accessed_at REAL NOT NULL DEFAULT 0"
+                )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_search_cache_expires_at"
+                " ON search_cache (expires_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_search_cache_accessed_at"
+                " ON search_cache (accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connexió del fil actual; es crea el primer cop i es reutilitza."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5.0)
+        return conn
+
+    def _read(self, key: str, allow_stale: bool = False) -> str | None:
+        now = time.time()
+        valid_after = now - (self.stale_seconds if allow_stale else 0)
+        conn = self._connect()
+        with conn:
+            row = conn.execute(
+                "SELECT payload, accessed_at FROM search_cache WHERE key = ? AND expires_at > ?",
+                (key, valid_after),
+            ).fetchone()
+            if row is None:
+                return None
+            payload, accessed_at = row
+            if accessed_at <= now - self.ACCESS_RESOLUTION:
+                conn.execute(
+                    "UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        return payload
+
+    def _write(self, key: str, payload: str, sweep: bool) -> None:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, expires_at, payload, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, now + self.ttl_seconds, payload, now),
+            )
+        if sweep:
+            self._sweep(conn, now)
+
+    def _sweep(self, conn: sqlite3.Connection, now: float) -> None:
+        """Esborra les entrades caducades i, si encara en sobren, les menys usades."""
+        with conn:
+            conn.execute(
+                "DELETE FROM search_cache WHERE expires_at <= ?", (now - self.stale_seconds,)
+            )
+            (count,) = conn.execute("SELECT count(*) FROM search_cache").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    async def _get(self, key: str) -> list[BookBase] | None:
+        payload = await asyncio.to_thread(self._read, key)
+        return self._decode(payload)
+
+    async def _get_stale(self, key: str) -> list[BookBase] | None:
+        payload = await asyncio.to_thread(self._read, key, True)
+        return self._decode(payload)
+
+    @staticmethod
+    def _decode(payload: str | None) -> list[BookBase] | None:
+        if payload is None:
+            return None
+        return _BOOK_LIST.validate_json(payload)
+
+    async def set(self, key: str, books: list[BookBase]) -> None:
+        payload = _BOOK_LIST.dump_json(books).decode()
+        # Es decideix a l'event loop perquè els fils no comparteixin el comptador
+        now = time.monotonic()
+        sweep = now >= self._next_sweep
+        if sweep:
+            self._next_sweep = now + self.SWEEP_INTERVAL
+        await asyncio.to_thread(self._write, key, payload, sweep)
+
+
+class TieredSearchCache(SearchCache):
+    """LRU en memòria davant d'una cache compartida entre processos."""
+
+    def __init__(self, local: SearchCache, shared: SearchCache):
+        super().__init__()
+        self.local = local
+        self.shared = shared
+        self.name = f"{local.name}+{shared.name}"
+
+    async def _get(self, key: str) -> list[BookBase] | None:
+        books = await self.local.get(key)
+        if books is not None:
+            return books
+        books = await self.shared.get(key)
+        if books is not None:
+            await self.local.set(key, books)
+        return books
+
+    async def _get_stale(self, key: str) -> list[BookBase] | None:
+        books = await self.local.get_stale(key)
+        if books is None:
+            books = await self.shared.get_stale(key)
+        return books
+
+    async def set(self, key: str, books: list[BookBase]) -> None:
+        await self.local.set(key, books)
+        await self.shared.set(key, books)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "local": self.local.stats(), "shared": self.shared.stats()}
+
+
+@lru_cache()
+def get_search_cache() -> SearchCache:
+    """
+    Factory function que construeix la cache segons la configuració.
+
+    Returns:
+        Instància compartida de SearchCache per a aquest procés
+    """
+    backend = settings.google_cache_backend
+    if backend == "none":
+        return NullSearchCache()
+
+    local = InMemorySearchCache(
+        ttl_seconds=settings.google_cache_ttl_seconds,
+        max_entries=settings.google_cache_max_entries,
+        stale_seconds=settings.google_cache_stale_seconds,
+    )
+    if backend == "sqlite":
+        shared = SQLiteSearchCache(
+            path=settings.google_cache_sqlite_path,
+            ttl_seconds=settings.google_cache_ttl_seconds,
+            max_entries=settings.google_cache_shared_max_entries,
+            stale_seconds=settings.google_cache_stale_seconds,
+        )
+        return TieredSearchCache(local, shared)
+    return local
@@ -0,0 +1,43 @@
+"""Agrupació de crides concurrents idèntiques (single-flight)."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Executa una sola vegada les crides concurrents amb la mateixa clau.
+
+    Les crides que arriben mentre n'hi ha una en curs esperen el mateix
+    resultat (o excepció). La tasca compartida està protegida amb
+    `asyncio.shield`, de manera que si es cancel·la una petició no es
+    cancel·la la crida per a la resta.
+    """
+
+    def __init__(self):
+        self._inflight: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Task[Any]] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Executa `fn` o s'afegeix a l'execució en curs per a `key`."""
+        # Les tasques pertanyen a un event loop: la clau l'inclou
+        flight_key = (asyncio.get_running_loop(), key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda done: self._forget(flight_key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: tuple, task: asyncio.Task) -> None:
+        if self._inflight.get(flight_key) is task:
+            del self._inflight[flight_key]
+
+    def stats(self) -> dict:
+        """Crides en curs i crides que s'han estalviat."""
+        return {"in_flight": len(self._inflight), "coalesced": self.coalesced}
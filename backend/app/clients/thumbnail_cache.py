@@ -0,0 +1,368 @@
+"""Proxy de miniatures de Google amb una cache a disc adreçada per contingut."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections.abc import Iterable
+from contextlib import suppress
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from app.clients.single_flight import SingleFlight
+from app.core.config import settings
+from app.core.metrics import THUMBNAIL_EVICTIONS, THUMBNAIL_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Tipus d'imatge acceptats i extensió amb què es desen
+IMAGE_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+MEDIA_TYPES = {extension: media_type for media_type, extension in IMAGE_TYPES.items()}
+
+# Un accés només actualitza la data d'ús (per a l'LRU) si és més antiga que això
+TOUCH_INTERVAL_SECONDS = 600
+# L'expulsió deixa la cache en aquesta fracció de la mida màxima
+EVICTION_TARGET = 0.9
+# Els objectes usats fa menys d'això no s'expulsen: una imatge que s'acaba de
+# servir té la data d'ús com a molt TOUCH_INTERVAL_SECONDS enrere
+EVICTION_MIN_IDLE_SECONDS = 2 * TOUCH_INTERVAL_SECONDS
+# Prefix dels fitxers temporals de les escriptures en curs
+TEMPORARY_PREFIX = ".tmp-"
+# Redireccions seguides per descarregar una miniatura (cadascuna es torna a validar)
+MAX_REDIRECTS = 3
+
+
+class ThumbnailFetchError(Exception):
+    """No s'ha pogut descarregar una miniatura o no és una imatge vàlida."""
+
+
+@dataclass(frozen=True)
+class CachedImage:
+    """
+    Imatge desada a disc; `digest` és el SHA-256 del contingut.
+
+    `stat` és del moment de la consulta: en servir-la no cal tornar a fer
+    `stat` (i no falla si l'expulsió l'esborra just després).
+    """
+
+    path: Path
+    digest: str
+    media_type: str
+    stat: os.stat_result
+
+
+class ThumbnailCache:
+    """
+    Cache de miniatures a disc, compartida pels workers del mateix servidor.
+
+    Només es descarreguen URLs https de `allowed_hosts` (i els seus
+    subdominis); les de Google en http es demanen en https. Les URLs surten
+    del catàleg, que es pot omplir amb la importació: sense aquesta llista
+    el servidor faria peticions a qualsevol adreça, incloses les internes.
+    Les redireccions se segueixen a mà i es validen igual.
+
+    Cada imatge es desa a `objects/<ab>/<sha256>.<ext>` amb el hash del
+    contingut com a nom (la imatge "sense portada" de Google, compartida per
+    molts llibres, es desa un sol cop) i cada URL és un enllaç simbòlic
+    `urls/<ab>/<sha256 de l'URL>` cap a l'objecte. Les escriptures són
+    atòmiques (fitxer temporal + `os.replace`), de manera que diversos
+    processos poden omplir la cache alhora sense bloquejos.
+
+    La data de modificació dels objectes fa de data d'últim ús: quan la mida
+    total supera `max_bytes` s'esborren els més antics (LRU). Un enllaç cap a
+    un objecte esborrat és una fallada i la imatge es torna a descarregar.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        max_image_bytes: int,
+        fetch_timeout: float,
+        prefetch_concurrency: int,
+        prefetch_queue_size: int,
+        allowed_hosts: Iterable[str] = (),
+    ):
+        self.directory = Path(directory)
+        self.objects = self.directory / "objects"
+        self.urls = self.directory / "urls"
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.fetch_timeout = fetch_timeout
+        self.prefetch_concurrency = prefetch_concurrency
+        self.prefetch_queue_size = prefetch_queue_size
+        self.allowed_hosts = tuple(host.lower() for host in allowed_hosts)
+        self.single_flight = SingleFlight()
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncClient
+        ] = weakref.WeakKeyDictionary()
+        self._queue: asyncio.Queue[str] | None = None
+        self._workers: list[asyncio.Task] = []
+        # Bytes escrits des de l'última expulsió: se'n fa una cada 10% de la mida màxima.
+        # Els fils de `asyncio.to_thread` l'actualitzen alhora: va protegit amb un lock
+        self._written = 0
+        self._written_lock = threading.Lock()
+        self._eviction_lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Client HTTP de l'event loop actual, creant-lo si és necessari."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(timeout=self.fetch_timeout, follow_redirects=False)
+            self._clients[loop] = client
+        return client
+
+    def start(self) -> None:
+        """Arrenca els workers de prefetch i una expulsió inicial en segon pla."""
+        if self._queue is None and self.prefetch_concurrency > 0:
+            self._queue = asyncio.Queue(self.prefetch_queue_size)
+            self._workers = [
+                asyncio.create_task(self._prefetch_worker(), name=f"thumbnail-prefetch-{i}")
+                for i in range(self.prefetch_concurrency)
+            ]
+        self._workers.append(asyncio.create_task(asyncio.to_thread(self.evict)))
+
+    async def close(self) -> None:
+        """Atura el prefetch (el pendent es descarta) i tanca el client HTTP."""
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+        self._queue = None
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def prefetch(self, urls: Iterable[str | None]) -> None:
+        """
+        Encua URLs perquè es descarreguin en segon pla.
+
+        És el millor esforç: si la cua és plena, la resta es descarta i es
+        descarregaran quan es demanin.
+        """
+        if self._queue is None:
+            return
+        for url in urls:
+            if not url:
+                continue
+            try:
+                self._queue.put_nowait(url)
+            except asyncio.QueueFull:
+                THUMBNAIL_LOOKUPS.labels("prefetch_dropped").inc()
+                return
+
+    async def get(self, url: str) -> CachedImage:
+        """Retorna la imatge de l'URL des de disc o la descarrega i la desa."""
+        image = await asyncio.to_thread(self._lookup, url)
+        if image is not None:
+            THUMBNAIL_LOOKUPS.labels("hit").inc()
+            return image
+        THUMBNAIL_LOOKUPS.labels("miss").inc()
+        # Les peticions simultànies de la mateixa imatge comparteixen la descàrrega
+        return await self.single_flight.do(url, lambda: self._fetch(url))
+
+    async def _prefetch_worker(self) -> None:
+        while True:
+            url = await self._queue.get()
+            try:
+                if await asyncio.to_thread(self._lookup, url) is None:
+                    await self.single_flight.do(url, lambda: self._fetch(url))
+            except Exception as e:
+                logger.debug(f"Error precarregant la miniatura {url}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def allowed_url(self, url: str) -> str:
+        """
+        URL que es pot descarregar: https, port per defecte i host permès.
+
+        Les URLs http d'un host permès es passen a https. Llança
+        ThumbnailFetchError per a qualsevol altra.
+        """
+        try:
+            parts = urlsplit(url)
+            port = parts.port
+        except ValueError as e:
+            raise ThumbnailFetchError(f"URL de miniatura no vàlida: {url}") from e
+        host = (parts.hostname or "").lower()
+        if not any(host == allowed or host.endswith(f".{allowed}") for allowed in self.allowed_hosts):
+            raise ThumbnailFetchError(f"Host no permès per a miniatures: {url}")
+        if parts.scheme not in ("http", "https") or port is not None or parts.username is not None:
+            raise ThumbnailFetchError(f"URL de miniatura no permesa: {url}")
+        return urlunsplit(parts._replace(scheme="https"))
+
+    async def _open(self, url: str) -> httpx.Response:
+        """Obre la resposta seguint les redireccions cap a URLs permeses."""
+        target = self.allowed_url(url)
+        for _ in range(MAX_REDIRECTS + 1):
+            response = await self.client.send(self.client.build_request("GET", target), stream=True)
+            if not response.is_redirect:
+                return response
+            await response.aclose()
+            target = self.allowed_url(str(response.next_request.url))
+        raise ThumbnailFetchError(f"Massa redireccions per {url}")
+
+    async def _fetch(self, url: str) -> CachedImage:
+        try:
+            response = await self._open(url)
+            try:
+                if response.status_code != 200:
+                    raise ThumbnailFetchError(f"Resposta {response.status_code} per {url}")
+                media_type = response.headers.get("content-type", "").split(";")[0].strip()
+                extension = IMAGE_TYPES.get(media_type)
+                if extension is None:
+                    raise ThumbnailFetchError(f"Tipus no admès '{media_type}' per {url}")
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise ThumbnailFetchError(f"Imatge de més de {self.max_image_bytes} bytes: {url}")
+                    chunks.append(chunk)
+            finally:
+                await response.aclose()
+        except httpx.HTTPError as e:
+            THUMBNAIL_LOOKUPS.labels("error").inc()
+            raise ThumbnailFetchError(f"Error descarregant {url}: {e!r}") from e
+        except ThumbnailFetchError:
+            THUMBNAIL_LOOKUPS.labels("error").inc()
+            raise
+        return await asyncio.to_thread(self._store, url, b"".join(chunks), extension)
+
+    def _url_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.urls / key[:2] / key
+
+    def _lookup(self, url: str) -> CachedImage | None:
+        try:
+            path = self._url_path(url).resolve(strict=True)
+            stat = path.stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL_SECONDS:
+            with suppress(FileNotFoundError):
+                os.utime(path)
+        return CachedImage(path, path.stem, MEDIA_TYPES[path.suffix], stat)
+
+    def _store(self, url: str, content: bytes, extension: str) -> CachedImage:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.objects / digest[:2] / f"{digest}{extension}"
+        eviction_due = False
+        if path.exists():
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._atomic_write(path, content)
+            with self._written_lock:
+                self._written += len(content)
+                eviction_due = self._written >= self.max_bytes // 10
+
+        link = self._url_path(url)
+        link.parent.mkdir(parents=True, exist_ok=True)
+        temporary = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}")
+        with suppress(FileNotFoundError):
+            temporary.unlink()
+        temporary.symlink_to(os.path.relpath(path, link.parent))
+        os.replace(temporary, link)
+
+        stat = path.stat()
+        if eviction_due:
+            self.evict()
+        return CachedImage(path, digest, MEDIA_TYPES[extension], stat)
+
+    @staticmethod
+    def _atomic_write(path: Path, content: bytes) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=path.parent, prefix=TEMPORARY_PREFIX)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(content)
+            os.replace(temporary, path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.unlink(temporary)
+            raise
+
+    def evict(self) -> int:
+        """
+        Esborra els objectes usats fa més temps fins a deixar la cache per sota
+        del 90% de `max_bytes`, i els enllaços que queden penjats.
+
+        Els fitxers temporals de les escriptures en curs no compten, i els
+        objectes usats fa menys de `EVICTION_MIN_IDLE_SECONDS` es conserven
+        encara que la cache quedi per sobre de la mida.
+
+        Retorna els objectes esborrats. Si ja n'hi ha una en curs en aquest
+        procés, no en fa cap altra.
+        """
+        if not self._eviction_lock.acquire(blocking=False):
+            return 0
+        try:
+            with self._written_lock:
+                self._written = 0
+            entries = []
+            total = 0
+            for path in self.objects.glob("*/*"):
+                if path.name.startswith(TEMPORARY_PREFIX):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return 0
+
+            entries.sort()
+            target = self.max_bytes * EVICTION_TARGET
+            idle_before = time.time() - EVICTION_MIN_IDLE_SECONDS
+            removed = 0
+            for modified, size, path in entries:
+                if total <= target or modified > idle_before:
+                    break
+                with suppress(FileNotFoundError):
+                    path.unlink()
+                    removed += 1
+                total -= size
+            for link in self.urls.glob("*/*"):
+                if not link.exists():
+                    with suppress(FileNotFoundError):
+                        link.unlink()
+            THUMBNAIL_EVICTIONS.inc(removed)
+            logger.info(f"Cache de miniatures: {removed} imatges esborrades, queden {total / 1e6:.1f} MB")
+            return removed
+        finally:
+            self._eviction_lock.release()
+
+
+@lru_cache()
+def get_thumbnail_cache() -> ThumbnailCache:
+    """
+    Factory function que retorna la cache de miniatures del procés.
+    """
+    return ThumbnailCache(
+        directory=settings.thumbnail_cache_dir,
+        max_bytes=settings.thumbnail_cache_max_bytes,
+        max_image_bytes=settings.thumbnail_max_image_bytes,
+        fetch_timeout=settings.thumbnail_fetch_timeout,
+        prefetch_concurrency=settings.thumbnail_prefetch_concurrency,
+        prefetch_queue_size=settings.thumbnail_prefetch_queue_size,
+        allowed_hosts=settings.thumbnail_allowed_hosts,
+    )
@@ -1,21 +1,48 @@
 """Client per a la API de Google Books amb patró Singleton."""
 
+import asyncio
+import logging
+import time
+import weakref
+from collections import deque
+from collections.abc import AsyncIterator
 from functools import lru_cache
 from typing import Self
 
 import httpx
+import orjson
 from datetime import date
 
 from core.config import settings
 from schemas import BookBase as Book
+from app.clients.search_cache import SearchCache, get_search_cache
+from app.core.isbn import ISBN_PLACEHOLDER
+from app.core.metrics import (
+    BOOKS_PARSED,
+    GOOGLE_REQUEST_SECONDS,
+    GOOGLE_RESPONSES,
+    SEARCH_CACHE_LOOKUPS,
+    stage,
+)
+from app.clients.rate_limit import RateLimiter, RateLimitExceeded, get_rate_limiter
+from app.clients.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+)
+from app.clients.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 
 class GoogleBooksClient:
     """Client per a la API de Google Books amb reuse de connexions HTTP."""
     
     BASE_URL = "https://www.googleapis.com/books/v1/volumes"
+    # Google Books API accepta com a màxim 40 resultats per petició
+    MAX_PAGE_SIZE = 40
     _instance: Self | None = None
-    _client: httpx.AsyncClient | None = None
 
     def __new__(cls) -> Self:
         """Implementa el patró Singleton per assegurar una sola instància."""
@@ -27,44 +54,266 @@ class GoogleBooksClient:
         """Inicialitza el client amb la API key de configuració."""
         if not hasattr(self, '_initialized'):
             self.api_key = settings.google_api_key
+            self.base_url = settings.google_books_base_url or self.BASE_URL
+            self.retry_policy = RetryPolicy(
+                max_retries=settings.google_max_retries,
+                backoff_base=settings.google_retry_backoff_base,
+                backoff_max=settings.google_retry_backoff_max,
+            )
+            self.breaker = CircuitBreaker(
+                failure_threshold=settings.google_circuit_failure_threshold,
+                reset_timeout=settings.google_circuit_reset_seconds,
+            )
+            self.cache: SearchCache = get_search_cache()
+            self.rate_limiter: RateLimiter = get_rate_limiter()
+            self.single_flight = SingleFlight()
+            # Un client HTTP per event loop: les connexions del pool pertanyen
+            # al loop que les ha obert i no es poden fer servir des d'un altre
+            self._clients: weakref.WeakKeyDictionary[
+                asyncio.AbstractEventLoop, httpx.AsyncClient
+            ] = weakref.WeakKeyDictionary()
             self._initialized = True
 
     @property
     def client(self) -> httpx.AsyncClient:
-        """Retorna el client HTTP, creant-lo si és necessari."""
-        if self._client is None or self._client.is_closed:
-            self._client = httpx.AsyncClient(
-                timeout=30.0,
-                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10)
+        """Retorna el client HTTP de l'event loop actual, creant-lo si és necessari."""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=settings.google_http2,
+                timeout=httpx.Timeout(
+                    settings.google_read_timeout,
+                    connect=settings.google_connect_timeout,
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.google_max_connections,
+                    max_keepalive_connections=settings.google_max_keepalive_connections,
+                    keepalive_expiry=settings.google_keepalive_expiry,
+                ),
             )
-        return self._client
+            self._clients[loop] = client
+        return client
+
+    async def warmup(self, connections: int | None = None) -> int:
+        """
+        Obre connexions amb Google abans de la primera petició.
+
+        Fa peticions HEAD concurrents (fora del limitador de quota i del
+        circuit breaker) perquè la resolució DNS i l'encaixada TLS no
+        s'afegeixin a la latència de les primeres cerques. Retorna les
+        connexions que han respost; un error només es registra.
+        """
+        if connections is None:
+            connections = settings.google_warmup_connections
+        if connections <= 0:
+            return 0
+
+        results = await asyncio.gather(
+            *(self.client.head(self.base_url) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(f"No s'han pogut preobrir connexions amb Google Books: {errors[0]!r}")
+        return len(results) - len(errors)
 
     async def close(self):
-        """Tanca el client HTTP de manera segura."""
-        if self._client is not None and not self._client.is_closed:
-            await self._client.aclose()
-            self._client = None
+        """Tanca el client HTTP de l'event loop actual de manera segura."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
 
-    async def search_books(self, query: str, max_results: int = 10) -> list[Book]:
+    async def search_books(
+        self,
+        query: str,
+        max_results: int = 10,
+        priority: str = "normal",
+        use_cache: bool = True,
+    ) -> list[Book]:
         """
-        Cerca llibres a Google Books API.
+        Cerca llibres a Google Books API, servint des de la cache si és possible.
+
+        `priority` ("high", "normal" o "low") decideix quant pot esperar la
+        petició quan la quota està exhaurida abans de descartar-se. Amb
+        `use_cache=False` es demana sempre a Google (el resultat sí que es
+        desa a la cache) i els errors no es cobreixen amb la cache obsoleta.
+        """
+        cache_key = self.cache.make_key(query, max_results)
+        if use_cache:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                SEARCH_CACHE_LOOKUPS.labels("hit").inc()
+                return cached
+            SEARCH_CACHE_LOOKUPS.labels("miss").inc()
+
+        # Les cerques idèntiques concurrents comparteixen una sola crida a Google
+        try:
+            books = await self.single_flight.do(
+                cache_key, lambda: self._fetch_books(query, max_results, cache_key, priority)
+            )
+        except (CircuitOpenError, RateLimitExceeded, httpx.HTTPError) as e:
+            # Millor una resposta antiga que un error mentre Google no respon
+            stale = await self.cache.get_stale(cache_key) if use_cache else None
+            if stale is None:
+                raise
+            SEARCH_CACHE_LOOKUPS.labels("stale").inc()
+            logger.warning(f"Google Books no disponible ({e!r}), es serveix la cache obsoleta")
+            books = stale
+        return list(books)
+
+    async def _fetch_books(
+        self, query: str, max_results: int, cache_key: str, priority: str = "normal"
+    ) -> list[Book]:
+        """
+        Demana la primera pàgina i, només si Google en té més, la resta.
+
+        Les pàgines següents no passen de `totalItems`, van en paral·lel com
+        a `iter_pages` i s'aturen a la primera pàgina incompleta. Si una
+        d'aquestes falla es retornen les obtingudes fins llavors, sense
+        desar-les a la cache; si falla la primera, l'error es propaga.
+        """
+        page_size = min(self.MAX_PAGE_SIZE, max(1, max_results))
+        books, total_items = await self._fetch_page(query, 0, page_size, priority)
+        available = min(max_results, total_items)
+
+        complete = True
+        if len(books) == page_size and available > page_size:
+            try:
+                async for page in self.iter_pages(
+                    query, available, priority=priority, start_index=page_size
+                ):
+                    books.extend(page)
+            except (CircuitOpenError, RateLimitExceeded, httpx.HTTPError) as e:
+                logger.warning(f"Resultats parcials de Google Books per '{query}': {e!r}")
+                complete = False
+
+        books = books[:max_results]
+        if complete:
+            await self.cache.set(cache_key, books)
+        return books
+
+    async def iter_pages(
+        self,
+        query: str,
+        max_results: int,
+        page_size: int = MAX_PAGE_SIZE,
+        priority: str = "normal",
+        start_index: int = 0,
+    ) -> AsyncIterator[list[Book]]:
+        """
+        Genera els resultats pàgina a pàgina sense acumular-los en memòria.
+
+        Es mantenen fins a `google_max_concurrent_pages` pàgines en vol i
+        es lliuren en ordre, des de `start_index` fins a `max_results` o fins
+        al `totalItems` de la primera resposta. S'atura quan Google retorna
+        una pàgina buida o incompleta.
+        """
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+        starts = iter(range(start_index, max_results, page_size))
+        pending: deque[tuple[int, asyncio.Task[tuple[list[Book], int]]]] = deque()
+        available = max_results
+
+        def schedule_next() -> None:
+            start = next(starts, None)
+            if start is not None and start < available:
+                size = min(page_size, available - start)
+                task = asyncio.ensure_future(self._fetch_page(query, start, size, priority))
+                pending.append((size, task))
+
+        for _ in range(settings.google_max_concurrent_pages):
+            schedule_next()
+
+        try:
+            while pending:
+                size, task = pending.popleft()
+                page, total_items = await task
+                available = min(available, total_items)
+                if page:
+                    yield page
+                if len(page) < size:
+                    break
+                schedule_next()
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _fetch_page(
+        self, query: str, start_index: int, page_size: int, priority: str = "normal"
+    ) -> tuple[list[Book], int]:
+        """
+        Demana una pàgina de resultats a Google Books i la parseja.
+
+        Retorna els llibres i el total de resultats que Google diu tenir
+        (`totalItems`).
         """
-        # Google Books API màxim = 10 resultats per petició
         params = {
-            "q": query, 
-            "maxResults": max(1, min(max_results, 10))
+            "q": query,
+            "startIndex": start_index,
+            "maxResults": max(1, min(page_size, self.MAX_PAGE_SIZE)),
         }
         if self.api_key:
             params["key"] = self.api_key
 
-        response = await self.client.get(self.BASE_URL, params=params)
-        response.raise_for_status()
-        data = response.json()
+        with stage("upstream"):
+            response = await self._get(params, priority)
+        with stage("parse"):
+            # orjson decodifica els bytes directament, sense passar per str
+            data = orjson.loads(response.content)
+            books = [self._parse_book(item) for item in data.get("items", [])]
+        BOOKS_PARSED.inc(len(books))
+        return books, data.get("totalItems", start_index + len(books))
+
+    async def _get(self, params: dict, priority: str = "normal") -> httpx.Response:
+        """
+        Fa la petició amb reintents per a 429/5xx i errors de xarxa.
+
+        Respecta la capçalera Retry-After i passa pel circuit breaker: si
+        Google està caigut, falla immediatament amb CircuitOpenError. Cada
+        intent consumeix un token del limitador de quota.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Google Books no disponible temporalment")
+
+        attempts = self.retry_policy.max_retries + 1
+        for attempt in range(attempts):
+            retry_after = None
+            await self.rate_limiter.acquire(priority)
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(self.base_url, params=params)
+            except httpx.TransportError as e:
+                error: Exception = e
+                self._observe_attempt(type(e).__name__, started)
+            else:
+                self._observe_attempt(str(response.status_code), started)
+                if not self.retry_policy.should_retry(response.status_code):
+                    # Un 4xx és culpa de la petició, no de la salut de Google;
+                    # un 5xx que no es reintenta (501, 505...) sí que compta
+                    if response.status_code < 500:
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.record_failure()
+                    response.raise_for_status()
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                error = httpx.HTTPStatusError(
+                    f"Google Books ha respost {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+
+            if attempt + 1 < attempts:
+                await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
 
-        if "items" not in data:
-            return []
+        self.breaker.record_failure()
+        raise error
 
-        return [self._parse_book(item) for item in data["items"]]
+    @staticmethod
+    def _observe_attempt(status: str, started: float) -> None:
+        """Registra la latència i el resultat d'un intent de petició."""
+        GOOGLE_REQUEST_SECONDS.labels(status).observe(time.perf_counter() - started)
+        GOOGLE_RESPONSES.labels(status).inc()
 
     def _parse_book(self, item: dict) -> Book:
         """
@@ -116,7 +365,7 @@ class GoogleBooksClient:
             elif identifier.get("type") == "ISBN_10":
                 isbn_10 = identifier.get("identifier")
         
-        return isbn_13 or isbn_10 or "Sense ISBN"
+        return isbn_13 or isbn_10 or ISBN_PLACEHOLDER
 
     def _parse_date(self, date_str: str | None) -> date | None:
         """Parseja dates en diferents formats (YYYY, YYYY-MM, YYYY-MM-DD)."""
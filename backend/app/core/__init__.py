@@ -1,6 +1,6 @@
 """Paquet de configuració central i base de dades."""
 
 from .config import settings
-from .db import create_db_and_tables, get_session
+from .db import create_db_and_tables, get_session, get_sync_session
 
-__all__ = ["settings", "create_db_and_tables", "get_session"]
+__all__ = ["settings", "create_db_and_tables", "get_session", "get_sync_session"]
@@ -0,0 +1,140 @@
+"""Compressió de respostes amb Brotli o gzip segons `Accept-Encoding`."""
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Dependència opcional: sense ella només es comprimeix amb gzip
+    brotli = None
+
+# Els blocs més grans es comprimeixen en un fil per no bloquejar l'event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+# Tipus de contingut que ja van comprimits: es deixen passar tal com són
+INCOMPRESSIBLE_TYPES = frozenset({
+    "image/*",
+    "video/*",
+    "audio/*",
+    "font/woff",
+    "font/woff2",
+    "application/zip",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-brotli",
+    "application/zstd",
+})
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Codificacions acceptades pel client (les que tenen `q=0` no hi compten)."""
+    encodings = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            pass
+        encodings.add(name.strip())
+    return encodings
+
+
+def is_incompressible(content_type: str) -> bool:
+    """Si el tipus de contingut (`image/jpeg`, `application/zip`...) ja va comprimit."""
+    media_type = content_type.partition(";")[0].strip().lower()
+    family = media_type.partition("/")[0] + "/*"
+    return media_type in INCOMPRESSIBLE_TYPES or family in INCOMPRESSIBLE_TYPES
+
+
+class SkipIncompressibleMixin:
+    """
+    Envia sense tocar les respostes de tipus ja comprimits.
+
+    Es decideix amb el missatge `http.response.start`: si el tipus és
+    incompressible, aquell missatge i tots els següents (també `pathsend`)
+    passen directament, com amb `IdentityResponder`.
+    """
+
+    _passthrough = False
+
+    async def send_with_compression(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self._passthrough = is_incompressible(headers.get("content-type", ""))
+        if self._passthrough:
+            await self.send(message)
+            return
+        await super().send_with_compression(message)
+
+
+class SelectiveGZipResponder(SkipIncompressibleMixin, GZipResponder):
+    """`GZipResponder` que no recomprimeix imatges ni arxius."""
+
+
+class BrotliResponder(SkipIncompressibleMixin, IdentityResponder):
+    """
+    Comprimeix amb Brotli, també les respostes en streaming.
+
+    Cada bloc es buida (`flush`) en enviar-lo perquè el client el pugui
+    descomprimir sense esperar el final.
+    """
+
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            # Mode text: les respostes comprimides són JSON, NDJSON i CSV
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Comprimeix les respostes de com a mínim `minimum_size` bytes.
+
+    Es prefereix Brotli si el client l'accepta (les descripcions llargues en
+    JSON es redueixen més que amb gzip a un cost de CPU semblant amb qualitat
+    baixa); si no, gzip. Les respostes amb `Content-Encoding` i les de tipus
+    ja comprimits (`INCOMPRESSIBLE_TYPES`: imatges, vídeo, arxius) es deixen
+    tal com són.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1000,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=gzip_level)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in encodings:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality)
+        elif "gzip" in encodings:
+            responder = SelectiveGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -1,5 +1,7 @@
 """Configuració central de l'aplicació utilitzant pydantic-settings."""
 
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -18,10 +20,112 @@ class Settings(BaseSettings):
     postgres_port: int = 5432
     postgres_db: str
     
+    # Pool de connexions (per procés: multiplicar pel nombre de workers d'uvicorn)
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    db_statement_timeout_ms: int | None = None
+
     api_port: int = 8000
+
+    # Mètriques Prometheus a /metrics i capçalera Server-Timing (desactivades per defecte)
+    metrics_enabled: bool = False
+
+    # Cache-Control de les respostes amb ETag (0 = revalidar sempre)
+    api_cache_max_age_seconds: int = 0
+    # Compressió de respostes (Brotli si el client l'accepta, si no gzip)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1000
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
     
     # Google Books API
     google_api_key: str | None = None
+    # Pàgines de resultats demanades en paral·lel per cerca
+    google_max_concurrent_pages: int = 4
+    # URL alternativa (p. ex. un servidor stub local per a proves)
+    google_books_base_url: str | None = None
+    # Connexions HTTP amb Google (per procés i event loop)
+    google_http2: bool = True
+    google_max_connections: int = 20
+    google_max_keepalive_connections: int = 20
+    google_keepalive_expiry: float = 30.0
+    # Connexions obertes a l'arrencada (DNS i TLS fora de la primera petició); 0 = cap
+    google_warmup_connections: int = 2
+
+    # Resiliència davant de Google: timeouts, reintents i circuit breaker
+    google_connect_timeout: float = 3.0
+    google_read_timeout: float = 10.0
+    google_max_retries: int = 2
+    google_retry_backoff_base: float = 0.2
+    google_retry_backoff_max: float = 5.0
+    google_circuit_failure_threshold: int = 5
+    google_circuit_reset_seconds: float = 30.0
+
+    # Límit de peticions a Google (token bucket); desactivat si no s'indica
+    google_rate_limit_per_second: float | None = None
+    google_rate_limit_burst: float | None = None
+    google_rate_limit_max_wait_seconds: float = 2.0
+    # "memory" (per procés) o "file" (compartit entre workers)
+    google_rate_limit_backend: Literal["memory", "file"] = "memory"
+    google_rate_limit_file_path: str = "/tmp/booktracker_google_rate_limit.json"
+
+    # Cache de cerques de Google Books: "memory", "sqlite" (compartida) o "none"
+    google_cache_backend: Literal["memory", "sqlite", "none"] = "memory"
+    google_cache_ttl_seconds: int = 3600
+    # Temps addicional que una entrada caducada es pot servir si Google falla
+    google_cache_stale_seconds: int = 86400
+    google_cache_max_entries: int = 1024
+    google_cache_shared_max_entries: int = 100_000
+    google_cache_sqlite_path: str = "/tmp/booktracker_search_cache.sqlite3"
+
+    # Cerca local: resultats mínims de la BD abans de recórrer a Google
+    local_search_min_results: int = 3
+
+    # Cerca massiva per ISBN: crides concurrents a Google i mida dels lots desats
+    isbn_lookup_concurrency: int = 8
+    isbn_lookup_persist_batch: int = 50
+    # Resultats demanats per ISBN: Google pot retornar primer una altra edició
+    isbn_lookup_candidates: int = 5
+
+    # Write-behind: les cerques responen sense esperar que es desin els llibres
+    write_behind_enabled: bool = False
+    write_behind_max_queue: int = 5000
+    write_behind_batch_size: int = 500
+    # Espera per acumular un lot després del primer llibre
+    write_behind_flush_interval: float = 0.05
+    # Espera màxima d'una petició amb la cua plena; després desa en línia
+    write_behind_put_timeout: float = 1.0
+    # Temps màxim per buidar la cua en aturar l'aplicació
+    write_behind_drain_timeout: float = 30.0
+
+    # Proxy de miniatures: cache a disc adreçada per contingut, compartida pels workers
+    thumbnail_cache_dir: str = "/tmp/booktracker_thumbnails"
+    thumbnail_cache_max_bytes: int = 512 * 1024 * 1024
+    thumbnail_max_image_bytes: int = 2 * 1024 * 1024
+    thumbnail_fetch_timeout: float = 10.0
+    # Hosts (i subdominis) d'on es poden descarregar miniatures, sempre en https
+    thumbnail_allowed_hosts: list[str] = ["books.google.com", "books.googleusercontent.com"]
+    # Descàrrega en segon pla de les miniatures dels llibres desats; 0 = sense prefetch
+    thumbnail_prefetch_concurrency: int = 4
+    thumbnail_prefetch_queue_size: int = 1000
+    # Cache-Control de les miniatures servides
+    thumbnail_max_age_seconds: int = 86400
+
+    # Refresc incremental de metadades (`python -m app.cli refresh`): els llibres
+    # demanats a Google fa més de `refresh_max_age_days` es tornen a demanar
+    refresh_max_age_days: float = 30.0
+    refresh_batch_size: int = 100
+    refresh_concurrency: int = 4
+    # Pressupost propi de peticions del refresc, a més de la quota general de
+    # Google; amb el backend "file" el comparteixen tots els processos de refresc
+    refresh_rate_limit_per_second: float | None = 1.0
+    refresh_rate_limit_file_path: str = "/tmp/booktracker_refresh_rate_limit.json"
+    # Espera del mode continu quan no hi ha res per refrescar o Google no respon
+    refresh_idle_seconds: float = 300.0
     
     @property
     def database_url(self) -> str:
@@ -31,4 +135,12 @@ class Settings(BaseSettings):
             f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_database_url(self) -> str:
+        """Construeix l'URL de connexió asíncrona (asyncpg) a la base de dades."""
+        return (
+            f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}"
+            f"@{self.postgres_host}:{self.postgres_port}/{self.postgres_db}"
+        )
+
 settings = Settings()
@@ -1,13 +1,121 @@
 """Configuració de la base de dades."""
 
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.core.pool_metrics import PoolMetrics, instrument_engine, timed_pool_class
+from app.models import Book
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# Clau de l'advisory lock que serialitza les migracions entre instàncies
+MIGRATION_LOCK_KEY = 0x626F6F6B
+# Revisió amb l'esquema que creava `create_all` abans d'adoptar Alembic
+BASELINE_REVISION = "1073a1202d8d"
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+def _pool_options() -> dict:
+    """Opcions de pool compartides pels motors síncron i asíncron."""
+    return {
+        "echo": settings.db_echo,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def _sync_connect_args() -> dict:
+    """Paràmetres de connexió de psycopg (statement_timeout opcional)."""
+    if settings.db_statement_timeout_ms is None:
+        return {}
+    return {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+
+
+def _async_connect_args() -> dict:
+    """Paràmetres de connexió d'asyncpg (statement_timeout opcional)."""
+    if settings.db_statement_timeout_ms is None:
+        return {}
+    return {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
 
-engine = create_engine(settings.database_url, echo=True)
 
-def get_session():
-    with Session(engine) as session:
+# Motor síncron: Alembic, scripts i creació de taules
+engine = create_engine(
+    settings.database_url,
+    poolclass=timed_pool_class(QueuePool, sync_pool_metrics),
+    connect_args=_sync_connect_args(),
+    **_pool_options(),
+)
+instrument_engine(engine, sync_pool_metrics)
+
+# Motor asíncron: peticions de l'API sense bloquejar l'event loop
+async_engine = create_async_engine(
+    settings.async_database_url,
+    poolclass=timed_pool_class(AsyncAdaptedQueuePool, async_pool_metrics),
+    connect_args=_async_connect_args(),
+    **_pool_options(),
+)
+instrument_engine(async_engine.sync_engine, async_pool_metrics)
+
+# Sense expirar en el commit: les respostes es serialitzen després de desar
+async_session_maker = async_sessionmaker(
+    async_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+async def get_session():
+    async with async_session_maker() as session:
+        yield session
+
+def get_sync_session():
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 def create_db_and_tables():
+    with engine.begin() as connection:
+        # L'índex de trigrames del títol necessita l'extensió pg_trgm
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     SQLModel.metadata.create_all(engine)
+
+def migrate_database() -> str:
+    """
+    Porta l'esquema a l'última migració; s'executa un sol cop abans dels workers.
+
+    La primera migració parteix d'una taula `books` ja existent: en una base
+    de dades buida es creen les taules des dels models i es marca `head`.
+    Una base de dades creada amb `create_db_and_tables` sense Alembic (com
+    feia abans el `lifespan`) té l'esquema de la revisió base: es marca
+    aquesta revisió i s'hi apliquen totes les migracions posteriors.
+    Retorna "created", "stamped" (base marcada i migrada) o "upgraded".
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    with engine.connect() as lock:
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            inspector = inspect(engine)
+            if not inspector.has_table(Book.__tablename__):
+                create_db_and_tables()
+                command.stamp(config, "head")
+                return "created"
+            if not inspector.has_table("alembic_version"):
+                command.stamp(config, BASELINE_REVISION)
+                command.upgrade(config, "head")
+                return "stamped"
+            command.upgrade(config, "head")
+            return "upgraded"
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+def get_pool_stats() -> list[dict]:
+    """Estat dels pools de connexions per dimensionar-los segons els workers."""
+    return [async_pool_metrics.snapshot(), sync_pool_metrics.snapshot()]
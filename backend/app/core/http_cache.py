@@ -0,0 +1,77 @@
+"""Utilitats de cache HTTP: validadors (ETag, Last-Modified) i peticions condicionals."""
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import orjson
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.core.config import settings
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Indica si la capçalera `If-None-Match` inclou l'ETag (comparació feble, RFC 9110).
+
+    Accepta llistes separades per comes, `*` i ETags amb prefix `W/`.
+    """
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+def make_etag(*parts) -> str:
+    """
+    ETag feble a partir de valors petits que identifiquen la versió (ids, dates).
+
+    És feble perquè el cos pot variar en bytes (compressió) sense canviar el contingut.
+    """
+    digest = hashlib.blake2b(orjson.dumps(parts), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: datetime | None = None,
+) -> Response | None:
+    """
+    Afegeix les capçaleres de validació a la resposta i comprova la petició condicional.
+
+    Retorna un 304 sense cos si el client ja té aquesta versió; l'endpoint
+    l'ha de retornar directament, abans de serialitzar res. Si hi ha
+    `If-None-Match`, `If-Modified-Since` s'ignora (RFC 9110).
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.api_cache_max_age_seconds}, must-revalidate",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        fresh = last_modified is not None and _not_modified_since(
+            request.headers.get("if-modified-since"), last_modified
+        )
+    return Response(status_code=304, headers=headers) if fresh else None
+
+
+def _not_modified_since(if_modified_since: str | None, last_modified: datetime) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # La capçalera té resolució de segons
+    return last_modified.replace(microsecond=0) <= since
@@ -0,0 +1,62 @@
+"""Utilitats per normalitzar i convertir ISBN."""
+
+import re
+
+# Valor que desa el client de Google quan un volum no té ISBN
+ISBN_PLACEHOLDER = "Sense ISBN"
+
+_ISBN_SEPARATORS = re.compile(r"[\s-]+")
+
+
+def normalize_isbn(value: str) -> str | None:
+    """
+    Treu guions i espais i valida la forma d'un ISBN-10 o ISBN-13.
+
+    Retorna None si el valor no té forma d'ISBN (no es comprova el dígit
+    de control: Google retorna ISBN amb dígits de control erronis).
+    """
+    isbn = _ISBN_SEPARATORS.sub("", value or "").upper()
+    if len(isbn) == 13 and isbn.isdigit():
+        return isbn
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X"):
+        return isbn
+    return None
+
+
+def isbn10_to_isbn13(isbn10: str) -> str:
+    """Converteix un ISBN-10 normalitzat al seu ISBN-13 (prefix 978)."""
+    core = "978" + isbn10[:9]
+    total = sum(int(digit) * (1 if i % 2 == 0 else 3) for i, digit in enumerate(core))
+    return core + str((10 - total % 10) % 10)
+
+
+def isbn13_to_isbn10(isbn13: str) -> str | None:
+    """Converteix un ISBN-13 amb prefix 978 a ISBN-10; els 979 no en tenen."""
+    if not isbn13.startswith("978"):
+        return None
+    core = isbn13[3:12]
+    total = sum(int(digit) * (10 - i) for i, digit in enumerate(core))
+    check = (11 - total % 11) % 11
+    return core + ("X" if check == 10 else str(check))
+
+
+def canonical_isbn(value: str | None) -> str | None:
+    """ISBN-13 equivalent d'un valor qualsevol, o None si no té forma d'ISBN."""
+    isbn = normalize_isbn(value)
+    if isbn and len(isbn) == 10:
+        return isbn10_to_isbn13(isbn)
+    return isbn
+
+
+def same_isbn(first: str | None, second: str | None) -> bool:
+    """Si dos valors són el mateix ISBN (ISBN-10 i ISBN-13 equivalents inclosos)."""
+    canonical = canonical_isbn(first)
+    if canonical is None:
+        return first not in (None, "", ISBN_PLACEHOLDER) and first == second
+    return canonical == canonical_isbn(second)
+
+
+def isbn_variants(isbn: str) -> list[str]:
+    """Formes equivalents d'un ISBN normalitzat (ell mateix i l'altra longitud)."""
+    other = isbn10_to_isbn13(isbn) if len(isbn) == 10 else isbn13_to_isbn10(isbn)
+    return [isbn, other] if other else [isbn]
@@ -0,0 +1,210 @@
+"""Mètriques Prometheus i temps per etapa (capçalera Server-Timing)."""
+
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+from app.core.config import settings
+
+METRICS_ENABLED = settings.metrics_enabled
+
+# Temps acumulat per etapa de la petició en curs (None fora d'una petició)
+_request_timings: ContextVar[dict[str, float] | None] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class _NullMetric:
+    """Mètrica buida: amb les mètriques desactivades, cada crida no fa res."""
+
+    def labels(self, *args, **kwargs) -> "_NullMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+if METRICS_ENABLED:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    STAGE_SECONDS = Histogram(
+        "booktracker_stage_seconds",
+        "Temps per etapa: google, upstream, parse, dedup, db_write, persist",
+        ["stage"],
+    )
+    HTTP_REQUEST_SECONDS = Histogram(
+        "booktracker_http_request_seconds",
+        "Temps de resposta de l'API per endpoint",
+        ["method", "endpoint", "status"],
+    )
+    GOOGLE_REQUEST_SECONDS = Histogram(
+        "booktracker_google_request_seconds",
+        "Latència de cada intent de petició a Google Books",
+        ["status"],
+    )
+    GOOGLE_RESPONSES = Counter(
+        "booktracker_google_responses_total",
+        "Respostes de Google Books per codi d'estat o tipus d'error",
+        ["status"],
+    )
+    SEARCH_CACHE_LOOKUPS = Counter(
+        "booktracker_search_cache_lookups_total",
+        "Consultes a la cache de cerques de Google (hit, miss, stale)",
+        ["result"],
+    )
+    BOOKS_PARSED = Counter(
+        "booktracker_books_parsed_total",
+        "Volums de Google convertits a llibres",
+    )
+    BOOK_WRITES = Counter(
+        "booktracker_book_writes_total",
+        "Llibres desats: inserits de nou o ja existents (duplicats)",
+        ["result"],
+    )
+    DB_ROWS_READ = Counter(
+        "booktracker_db_rows_read_total",
+        "Files llegides de la base de dades per operació",
+        ["operation"],
+    )
+    WRITE_QUEUE_DEPTH = Gauge(
+        "booktracker_write_queue_depth",
+        "Llibres pendents de desar a la cua write-behind",
+        # Amb diversos workers, la suma dels processos vius
+        multiprocess_mode="livesum",
+    )
+    WRITE_QUEUE_FLUSH_SECONDS = Histogram(
+        "booktracker_write_queue_flush_seconds",
+        "Temps de desar cada lot de la cua write-behind",
+    )
+    WRITE_QUEUE_BOOKS = Counter(
+        "booktracker_write_queue_books_total",
+        "Llibres de la cua write-behind: desats, fallits o desats en línia per cua plena",
+        ["result"],
+    )
+    THUMBNAIL_LOOKUPS = Counter(
+        "booktracker_thumbnail_lookups_total",
+        "Consultes a la cache de miniatures (hit, miss, error, prefetch_dropped)",
+        ["result"],
+    )
+    THUMBNAIL_EVICTIONS = Counter(
+        "booktracker_thumbnail_evictions_total",
+        "Miniatures esborrades de la cache a disc per mida",
+    )
+    BOOK_REFRESHES = Counter(
+        "booktracker_book_refreshes_total",
+        "Llibres refrescats: updated, unchanged, not_found, error, deferred o conflict",
+        ["result"],
+    )
+else:
+    STAGE_SECONDS = HTTP_REQUEST_SECONDS = GOOGLE_REQUEST_SECONDS = _NullMetric()
+    GOOGLE_RESPONSES = SEARCH_CACHE_LOOKUPS = BOOKS_PARSED = _NullMetric()
+    BOOK_WRITES = DB_ROWS_READ = _NullMetric()
+    WRITE_QUEUE_DEPTH = WRITE_QUEUE_FLUSH_SECONDS = WRITE_QUEUE_BOOKS = _NullMetric()
+    THUMBNAIL_LOOKUPS = THUMBNAIL_EVICTIONS = BOOK_REFRESHES = _NullMetric()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Mètriques en format de text de Prometheus i el seu content type.
+
+    Amb `PROMETHEUS_MULTIPROC_DIR` (gunicorn amb diversos workers) s'agreguen
+    els fitxers de tots els processos: si no, cada worker només veuria les seves.
+    """
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _StageTimer:
+    """Mesura una etapa: histograma i acumulat de la petició en curs."""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.labels(self.name).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+
+
+_NULL_STAGE = nullcontext()
+
+
+def stage(name: str):
+    """
+    Context manager que cronometra una etapa.
+
+    Les etapes es poden niar i, si s'executen en paral·lel (pàgines de
+    Google), el temps de la petició és la suma de totes.
+    """
+    return _StageTimer(name) if METRICS_ENABLED else _NULL_STAGE
+
+
+def server_timing_header(timings: dict[str, float], total: float) -> str:
+    """Valor de la capçalera Server-Timing en mil·lisegons."""
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware ASGI que afegeix `Server-Timing` i registra el temps per endpoint.
+
+    La capçalera s'envia amb l'inici de la resposta: en les respostes en
+    streaming només inclou el temps fins al primer bloc.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing_header(timings, time.perf_counter() - started)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # El nom de l'endpoint: cardinalitat fitada i independent del prefix del router
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "name", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
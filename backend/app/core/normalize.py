@@ -0,0 +1,81 @@
+"""Normalització de text per a la detecció de duplicats."""
+
+import re
+import sys
+import unicodedata
+from functools import cache, lru_cache
+
+# Nombre màxim de textos normalitzats que es recorden (títols i autors)
+NORMALIZE_CACHE_SIZE = 65536
+
+# Puntuació que s'elimina: ! ? ¿ ¡ . , ; : ( ) [ ] { } " '
+# (una expressió precompilada és més ràpida que str.translate per esborrar)
+_PUNCTUATION = re.compile(r'[!?¿¡.,;:\(\)\[\]{}"\']+')
+
+_ASTRAL = re.compile("[\U00010000-\U0010FFFF]")
+
+# Inici d'un subtítol o d'una nota d'edició: "Títol: subtítol", "Títol - ...", "Títol (...)"
+_SUBTITLE = re.compile(r"\s*(?:[:(\[]|\s[-–—]\s).*$", re.DOTALL)
+
+
+@cache
+def _combining_marks() -> tuple[re.Pattern, dict[int, None]]:
+    """
+    Caràcters de categoria Mn de la versió d'Unicode de l'intèrpret.
+
+    Els del pla bàsic (BMP) van en una classe de caràcters literals, que
+    `re` compila com un mapa de bits; els astrals, molt poc freqüents, en
+    una taula per a `str.translate`. Es construeix el primer cop que arriba
+    text no ASCII perquè recórrer tot Unicode costa unes dècimes de segon.
+    """
+    marks = [
+        code for code in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(code)) == "Mn"
+    ]
+    bmp = "".join(re.escape(chr(code)) for code in marks if code <= 0xFFFF)
+    astral = {code: None for code in marks if code > 0xFFFF}
+    return re.compile(f"[{bmp}]+"), astral
+
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_text(text: str) -> str:
+    """
+    Normalitza text per comparació de duplicats.
+
+    Minúscules, sense accents (NFD, sense marques Mn, NFC), sense puntuació
+    i amb els espais col·lapsats. El text ASCII no necessita les passades
+    Unicode i va pel camí ràpid.
+    """
+    if not text:
+        return ""
+
+    text = text.lower()
+    if not text.isascii():
+        bmp_marks, astral_marks = _combining_marks()
+        text = bmp_marks.sub("", unicodedata.normalize("NFD", text))
+        if _ASTRAL.search(text):
+            text = text.translate(astral_marks)
+        text = unicodedata.normalize("NFC", text)
+
+    return " ".join(_PUNCTUATION.sub("", text).split())
+
+
+def strip_subtitle(title: str) -> str:
+    """
+    Treu el subtítol o la nota d'edició d'un títol.
+
+    Si no queda res (títols que comencen per parèntesi) es retorna sencer.
+    """
+    return _SUBTITLE.sub("", title or "") or title
+
+
+def split_names(value: str | None) -> list[str]:
+    """
+    Separa una llista de noms unida amb comes (autors o categories).
+
+    És el format en què `GoogleBooksClient._normalize_list` desa les llistes
+    a `Book.author` i `Book.categories`.
+    """
+    if not value:
+        return []
+    return [name for name in (part.strip() for part in value.split(",")) if name]
@@ -0,0 +1,30 @@
+"""Cursors opacs per a la paginació per clau (keyset)."""
+
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """El cursor no és vàlid o no correspon a l'ordenació demanada."""
+
+
+def encode_cursor(sort: str, key: list) -> str:
+    """Codifica l'ordenació i la clau de l'última fila en un cursor opac."""
+    payload = json.dumps([sort, *key], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    """
+    Recupera la clau d'un cursor generat per `encode_cursor`.
+
+    Llança `InvalidCursor` si el cursor està malmès o és d'una altra ordenació.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, *key = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Cursor de paginació no vàlid") from e
+    if cursor_sort != sort:
+        raise InvalidCursor(f"El cursor no correspon a l'ordenació '{sort}'")
+    return key
@@ -0,0 +1,78 @@
+"""Mètriques d'ús del pool de connexions de la base de dades."""
+
+import time
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+
+class PoolMetrics:
+    """Comptadors de checkout i temps d'espera d'un pool de connexions."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._engine: Engine | None = None
+
+    def observe_wait(self, seconds: float) -> None:
+        """Registra el temps que ha trigat un checkout a obtenir connexió."""
+        self.wait_seconds_total += seconds
+        if seconds > self.wait_seconds_max:
+            self.wait_seconds_max = seconds
+
+    def snapshot(self) -> dict:
+        """Retorna l'estat actual del pool i els comptadors acumulats."""
+        pool = self._engine.pool if self._engine is not None else None
+        return {
+            "pool": self.name,
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": pool.overflow() if pool is not None else 0,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_avg": (
+                round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0
+            ),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+def timed_pool_class(base: type[Pool], metrics: PoolMetrics) -> type[Pool]:
+    """
+    Crea una subclasse del pool que mesura l'espera de cada checkout.
+
+    Les mètriques es guarden a la classe perquè sobrevisquin a
+    `engine.dispose()`, que recrea el pool amb `self.__class__`.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return base._do_get(self)
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.observe_wait(time.perf_counter() - start)
+
+    return type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get, "metrics": metrics})
+
+
+def instrument_engine(engine: Engine, metrics: PoolMetrics) -> None:
+    """Registra els listeners de checkout i connexió sobre el pool del motor."""
+    metrics._engine = engine
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
@@ -1,6 +1,6 @@
 """Paquet de capa d'accés a dades (operacions CRUD)."""
 
+from .async_book_repository import AsyncBookRepository
 from .book_repository import BookRepository
 
-__all__ = ["BookRepository"]
-
+__all__ = ["AsyncBookRepository", "BookRepository"]
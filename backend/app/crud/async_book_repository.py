@@ -0,0 +1,498 @@
+"""Repositori asíncron per a operacions CRUD de llibres."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from datetime import datetime
+
+from sqlalchemy import String, any_, bindparam, delete, func, or_, text, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.metrics import BOOK_WRITES, DB_ROWS_READ, stage
+from app.crud.book_repository import BookRepository
+from app.models import (
+    BOOK_SEARCH_VECTOR,
+    ISBN_IS_KNOWN,
+    SEARCH_CONFIG,
+    Author,
+    Book,
+    BookAuthor,
+    BookCategory,
+    Category,
+)
+from app.schemas import BookBase
+
+# Columnes del catàleg en l'ordre d'exportació i importació. Inclouen
+# `fetched_at` perquè importar un llibre no el faci passar per refrescat
+EXPORT_COLUMNS = ["id", *BookBase.model_fields, "fetched_at"]
+IMPORT_COLUMNS = [*BookBase.model_fields, "fetched_at", "normalized_key"]
+# El llistat retorna també la data de modificació, que en fa l'ETag
+LIST_COLUMNS = ["id", *BookBase.model_fields, "updated_at"]
+# Camps que el refresc de metadades pot canviar: títol, autor i ISBN identifiquen el llibre
+REFRESH_COLUMNS = [name for name in BookBase.model_fields if name not in ("title", "author", "isbn")]
+
+# Columnes de cada ordenació del llistat; l'última sempre és l'id per desempatar
+LIST_SORT_KEYS = {"id": ["id"], "title": ["title", "id"]}
+
+# Faceta -> (model, columna de la faceta a la taula d'unió, columna del llibre)
+FACET_MODELS = {
+    "authors": (Author, BookAuthor.author_id, BookAuthor.book_id),
+    "categories": (Category, BookCategory.category_id, BookCategory.book_id),
+}
+
+
+class AsyncBookRepository:
+    """
+    Versió asíncrona de `BookRepository` per a les peticions de l'API.
+
+    Comparteix la normalització i la construcció de sentències amb el
+    repositori síncron, que es manté per a Alembic i scripts.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, book_data: BookBase) -> Book:
+        """
+        Crea un llibre nou. Si ja existeix (títol+autor normalitzats), retorna l'existent.
+        """
+        normalized_key = BookRepository.build_normalized_key(book_data.title, book_data.author)
+
+        with stage("dedup"):
+            existing_book = await self.get_by_normalized_key(normalized_key)
+        if existing_book:
+            BOOK_WRITES.labels("duplicate").inc()
+            return existing_book
+
+        book = Book.model_validate(book_data, update={"normalized_key": normalized_key})
+        self.db.add(book)
+        try:
+            with stage("db_write"):
+                await self.db.flush()
+                await self.link_facets([book])
+                await self.db.commit()
+        except IntegrityError:
+            # Una altra petició l'ha inserit entre la consulta i el commit
+            await self.db.rollback()
+            existing_book = await self.get_by_normalized_key(normalized_key)
+            if existing_book:
+                BOOK_WRITES.labels("duplicate").inc()
+                return existing_book
+            raise
+        await self.db.refresh(book)
+        BOOK_WRITES.labels("inserted").inc()
+        return book
+
+    async def bulk_upsert(self, books_data: list[BookBase]) -> list[Book]:
+        """
+        Desa un lot de llibres amb un sol INSERT ... ON CONFLICT i un sol commit.
+        """
+        rows = BookRepository.prepare_upsert_rows(books_data)
+        if not rows:
+            return []
+
+        statement = BookRepository.upsert_statement()
+        try:
+            with stage("db_write"):
+                result = await self.db.scalars(statement, list(rows.values()))
+                books = {book.normalized_key: book for book in result}
+                await self.link_facets(books.values())
+            inserted = len(books)
+
+            # Les files en conflicte no surten al RETURNING: es recuperen d'un sol cop
+            missing_keys = [key for key in rows if key not in books]
+            if missing_keys:
+                with stage("dedup"):
+                    existing = select(Book).where(Book.normalized_key.in_(missing_keys))
+                    result = await self.db.exec(existing)
+                    books.update((book.normalized_key, book) for book in result)
+                DB_ROWS_READ.labels("bulk_upsert").inc(len(books) - inserted)
+
+            with stage("db_write"):
+                await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        BOOK_WRITES.labels("inserted").inc(inserted)
+        BOOK_WRITES.labels("duplicate").inc(len(rows) - inserted)
+
+        return [books[key] for key in rows if key in books]
+
+    async def link_facets(self, books) -> None:
+        """Enllaça llibres acabats d'inserir amb els seus autors i categories."""
+        for facet, params in BookRepository.facet_params(books).items():
+            if params["keys"]:
+                names_statement, links_statement = BookRepository.facet_statements(facet)
+                await self.db.execute(names_statement, params)
+                await self.db.execute(links_statement, params)
+
+    async def find_by_title_author(self, title: str, author: str) -> Book | None:
+        """Cerca un llibre per títol i autor amb normalització."""
+        with stage("dedup"):
+            return await self.get_by_normalized_key(
+                BookRepository.build_normalized_key(title, author)
+            )
+
+    async def get_by_normalized_key(self, normalized_key: str) -> Book | None:
+        """Cerca un llibre per la seva clau títol+autor normalitzada."""
+        statement = select(Book).where(Book.normalized_key == normalized_key)
+        result = await self.db.exec(statement)
+        book = result.first()
+        if book is not None:
+            DB_ROWS_READ.labels("get_by_normalized_key").inc()
+        return book
+
+    async def search_local(self, query: str, limit: int = 10) -> list[Book]:
+        """
+        Cerca llibres desats amb l'índex de text complet i trigrames del títol.
+
+        Combina coincidències de paraules (títol, autor i descripció) amb
+        similitud aproximada del títol per tolerar errors tipogràfics.
+        """
+        ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        relevance = func.ts_rank_cd(BOOK_SEARCH_VECTOR, ts_query) + func.similarity(
+            Book.title, query
+        )
+        statement = (
+            select(Book)
+            .where(or_(BOOK_SEARCH_VECTOR.op("@@")(ts_query), Book.title.op("%")(query)))
+            .order_by(relevance.desc(), Book.id)
+            .limit(limit)
+        )
+        result = await self.db.exec(statement)
+        return result.all()
+
+    async def get_by_id(self, book_id: int) -> Book | None:
+        """Cerca un llibre pel seu ID."""
+        return await self.db.get(Book, book_id)
+
+    async def get_all(self) -> list[Book]:
+        """Obté tots els llibres."""
+        result = await self.db.exec(select(Book))
+        return result.all()
+
+    async def list_page(
+        self,
+        sort: str = "id",
+        after: list | None = None,
+        limit: int = 50,
+        fields: list[str] | None = None,
+        language: str | None = None,
+        categories: str | None = None,
+        author: str | None = None,
+        author_id: int | None = None,
+        category_id: int | None = None,
+    ) -> list[dict]:
+        """
+        Retorna una pàgina del llistat amb paginació per clau (seek).
+
+        En lloc d'OFFSET es filtra per `(clau) > after`, de manera que
+        PostgreSQL entra directament a l'índex i el cost no depèn de la
+        profunditat de la pàgina. `fields` limita les columnes llegides;
+        les de la clau d'ordenació s'hi afegeixen sempre per poder
+        construir el cursor següent, i `updated_at` per calcular l'ETag.
+        `author_id` i `category_id` filtren per les taules d'unió, que tenen
+        índex per faceta. `categories` (ja normalitzat) també hi passa: primer
+        es busquen les categories que el contenen a la taula `categories`, que
+        és petita, i se'n filtra per ids, en lloc de fer un ILIKE sense índex
+        sobre `books.categories`. Amb els ids ja resolts el planificador en fa
+        servir les estadístiques per triar entre recórrer l'índex de l'ordre
+        o el de la faceta.
+        """
+        key_names = LIST_SORT_KEYS[sort]
+        names = list(dict.fromkeys([*(fields or LIST_COLUMNS), *key_names, "updated_at"]))
+        key_columns = [getattr(Book, name) for name in key_names]
+
+        statement = select(*(getattr(Book, name) for name in names))
+        if language:
+            statement = statement.where(Book.language == language)
+        if author:
+            statement = statement.where(Book.author == author)
+        if categories:
+            category_ids = (await self.db.execute(
+                select(Category.id).where(
+                    Category.normalized_name.contains(categories, autoescape=True)
+                )
+            )).scalars().all()
+            if not category_ids:
+                return []
+            statement = statement.where(
+                Book.id.in_(
+                    select(BookCategory.book_id).where(BookCategory.category_id.in_(category_ids))
+                )
+            )
+        for facet, facet_id in (("authors", author_id), ("categories", category_id)):
+            if facet_id is not None:
+                _, link_column, book_column = FACET_MODELS[facet]
+                statement = statement.where(
+                    Book.id.in_(select(book_column).where(link_column == facet_id))
+                )
+        if after is not None:
+            statement = statement.where(tuple_(*key_columns) > tuple_(*after))
+        statement = statement.order_by(*key_columns).limit(limit)
+
+        result = await self.db.execute(statement)
+        return [dict(row) for row in result.mappings()]
+
+    async def list_facets(self, facet: str, prefix: str | None = None, limit: int = 50) -> list[dict]:
+        """
+        Autors o categories amb el nombre de llibres, dels que en tenen més.
+
+        `prefix` (ja normalitzat) filtra per l'inici del nom normalitzat amb
+        l'índex `text_pattern_ops`.
+        """
+        model, link_column, _ = FACET_MODELS[facet]
+        book_count = func.count().label("book_count")
+        statement = (
+            select(model.id, model.name, book_count)
+            .join(link_column.table, link_column == model.id)
+            .group_by(model.id)
+            .order_by(book_count.desc(), model.normalized_name)
+            .limit(limit)
+        )
+        if prefix:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            statement = statement.where(model.normalized_name.like(f"{escaped}%", escape="\\"))
+        result = await self.db.execute(statement)
+        return [dict(row) for row in result.mappings()]
+
+    async def get_by_isbn(self, isbn: str) -> Book | None:
+        """Cerca un llibre pel seu ISBN."""
+        statement = select(Book).where(Book.isbn == isbn)
+        result = await self.db.exec(statement)
+        return result.first()
+
+    async def get_by_isbns(self, isbns: list[str]) -> list[Book]:
+        """
+        Cerca molts llibres per ISBN amb una sola consulta `isbn = ANY(...)`.
+
+        La condició sobre el valor de relleu permet usar l'índex parcial.
+        """
+        if not isbns:
+            return []
+        statement = select(Book).where(
+            Book.isbn == any_(bindparam("isbns", list(isbns), type_=ARRAY(String))),
+            ISBN_IS_KNOWN,
+        )
+        result = await self.db.exec(statement)
+        return result.all()
+
+    async def stream_rows(
+        self, batch_size: int = 1000, columns: list[str] = EXPORT_COLUMNS
+    ) -> AsyncIterator[dict]:
+        """Recorre el catàleg amb un cursor de servidor, sense carregar-lo sencer."""
+        statement = select(*(getattr(Book, name) for name in columns)).order_by(Book.id).execution_options(yield_per=batch_size)
+        result = await self.db.stream(statement)
+        async for partition in result.mappings().partitions():
+            for row in partition:
+                yield row
+
+    async def get_rows_by_ids(self, ids: list[int], columns: list[str] = EXPORT_COLUMNS) -> list[dict]:
+        """Columnes indicades dels llibres amb aquests ids (els que no existeixen no hi surten)."""
+        statement = select(*(getattr(Book, name) for name in columns)).where(Book.id.in_(ids))
+        result = await self.db.execute(statement)
+        return list(result.mappings())
+
+    async def claim_stale(self, fetched_before: datetime, limit: int) -> list[dict]:
+        """
+        Reserva per refrescar fins a `limit` llibres amb ISBN demanats a
+        Google abans de `fetched_before`, dels més antics als més nous.
+
+        Les files es bloquegen amb `FOR UPDATE SKIP LOCKED`, de manera que
+        els workers concurrents se salten les que reserva un altre, i la
+        mateixa sentència els posa `fetched_at = now()`: després del commit
+        ja no són obsoletes per a ningú i no cal mantenir la transacció
+        oberta mentre es demanen a Google. `updated_at` no canvia. Cada fila
+        porta `previous_fetched_at` per poder desfer la reserva.
+        """
+        stale = (
+            select(Book.id, Book.fetched_at)
+            .where(ISBN_IS_KNOWN, Book.fetched_at < fetched_before)
+            .order_by(Book.fetched_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .subquery("stale")
+        )
+        books = Book.__table__
+        statement = (
+            update(books)
+            .where(books.c.id == stale.c.id)
+            .values(fetched_at=func.now(), updated_at=books.c.updated_at)
+            .returning(
+                books.c.id,
+                books.c.isbn,
+                books.c.updated_at,
+                *(books.c[name] for name in REFRESH_COLUMNS),
+                stale.c.fetched_at.label("previous_fetched_at"),
+            )
+        )
+        try:
+            result = await self.db.execute(statement)
+            rows = [dict(row) for row in result.mappings()]
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        DB_ROWS_READ.labels("claim_stale").inc(len(rows))
+        return rows
+
+    async def update_refreshed(self, changes: dict[int, tuple[datetime, dict]]) -> list[int]:
+        """
+        Desa els camps canviats de cada llibre refrescat en una transacció.
+
+        `changes` és `{id: (updated_at llegit en reservar-lo, {camp: valor})}`.
+        Un llibre que s'ha modificat després de la reserva no es toca (el
+        seu `updated_at` ja no coincideix). Si canvien les categories es
+        refan els enllaços de la faceta. Retorna els ids actualitzats.
+        """
+        books = Book.__table__
+        updated = []
+        try:
+            with stage("db_write"):
+                for book_id, (updated_at, fields) in changes.items():
+                    statement = (
+                        update(books)
+                        .where(books.c.id == book_id, books.c.updated_at == updated_at)
+                        .values(**fields)
+                        .returning(books.c.id, books.c.author, books.c.categories)
+                    )
+                    row = (await self.db.execute(statement)).first()
+                    if row is not None:
+                        updated.append(row)
+
+                relinked = [row for row in updated if "categories" in changes[row.id][1]]
+                if relinked:
+                    await self.db.execute(
+                        delete(BookCategory).where(BookCategory.book_id.in_([row.id for row in relinked]))
+                    )
+                    params = BookRepository.facet_params(relinked)["categories"]
+                    if params["keys"]:
+                        names_statement, links_statement = BookRepository.facet_statements("categories")
+                        await self.db.execute(names_statement, params)
+                        await self.db.execute(links_statement, params)
+                await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return [row.id for row in updated]
+
+    async def release_claims(self, claims: list[tuple[int, datetime]]) -> None:
+        """
+        Desfà reserves de `claim_stale` tornant a posar el `fetched_at`
+        anterior, perquè els llibres es tornin a provar aviat.
+        """
+        if not claims:
+            return
+        books = Book.__table__
+        statement = (
+            update(books)
+            .where(books.c.id == bindparam("book_id"))
+            .values(fetched_at=bindparam("previous_fetched_at"), updated_at=books.c.updated_at)
+        )
+        try:
+            await self.db.execute(
+                statement,
+                [{"book_id": book_id, "previous_fetched_at": fetched_at} for book_id, fetched_at in claims],
+            )
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+    async def copy_out_csv(self, queue_size: int = 16) -> AsyncIterator[bytes]:
+        """
+        Exporta el catàleg en CSV amb `COPY ... TO STDOUT`.
+
+        Els blocs de PostgreSQL passen per una cua limitada: si el client
+        llegeix a poc a poc, el COPY s'atura i la memòria es manté constant.
+        """
+        driver = await self._driver_connection()
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=queue_size)
+        query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM books ORDER BY id"
+
+        async def output(data: bytes) -> None:
+            # asyncpg pot reutilitzar el buffer: se'n fa una còpia immutable
+            await queue.put(bytes(data))
+
+        async def copy() -> None:
+            try:
+                await driver.copy_from_query(query, output=output, format="csv", header=True)
+            finally:
+                await queue.put(None)
+
+        task = asyncio.ensure_future(copy())
+        try:
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+            await task
+        finally:
+            task.cancel()
+
+    async def import_via_staging(self, batches: AsyncIterator[list[tuple]]) -> dict:
+        """
+        Importa lots de files amb COPY a una taula temporal i les fusiona.
+
+        Cada fila ha de seguir l'ordre d'`IMPORT_COLUMNS`. La fusió descarta
+        els duplicats dins de la importació i els que ja existeixen per la
+        clau normalitzada, tot en una sola transacció. Els llibres inserits
+        s'enllacen després amb els seus autors i categories.
+        """
+        columns = ", ".join(IMPORT_COLUMNS)
+        await self.db.execute(text(
+            f"CREATE TEMP TABLE books_import ON COMMIT DROP AS "
+            f"SELECT {columns} FROM books WITH NO DATA"
+        ))
+        driver = await self._driver_connection()
+        staged = 0
+        try:
+            async for records in batches:
+                if records:
+                    await driver.copy_records_to_table(
+                        "books_import", records=records, columns=IMPORT_COLUMNS
+                    )
+                    staged += len(records)
+
+            # Qualsevol conflicte (clau normalitzada o títol+autor) vol dir que ja existeix.
+            # Els inserits es guarden a part per enllaçar-ne les facetes per lots.
+            await self.db.execute(text(
+                "CREATE TEMP TABLE books_imported "
+                "(id INTEGER PRIMARY KEY, author VARCHAR, categories VARCHAR) ON COMMIT DROP"
+            ))
+            result = await self.db.execute(text(
+                f"WITH inserted AS ("
+                f"INSERT INTO books ({columns}) "
+                f"SELECT DISTINCT ON (normalized_key) {columns} FROM books_import "
+                f"ORDER BY normalized_key ON CONFLICT DO NOTHING "
+                f"RETURNING id, author, categories) "
+                f"INSERT INTO books_imported SELECT * FROM inserted"
+            ))
+            await self._link_imported_facets()
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return {"staged": staged, "inserted": result.rowcount}
+
+    async def _link_imported_facets(self, batch_size: int = 5000) -> None:
+        """Enllaça les facetes dels llibres de `books_imported` per lots d'id."""
+        last_id = 0
+        while True:
+            rows = (await self.db.execute(
+                text(
+                    "SELECT id, author, categories FROM books_imported "
+                    "WHERE id > :last_id ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            )).all()
+            if not rows:
+                break
+            await self.link_facets(rows)
+            last_id = rows[-1].id
+
+    async def _driver_connection(self):
+        """Connexió asyncpg subjacent a la sessió, per a operacions COPY."""
+        connection = await self.db.connection()
+        raw_connection = await connection.get_raw_connection()
+        return raw_connection.driver_connection
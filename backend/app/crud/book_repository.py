@@ -1,75 +1,232 @@
 """Repositori per a operacions CRUD de llibres."""
 
-import unicodedata
-import re
+from collections.abc import Iterable
+
+from sqlalchemy import Integer, String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
+from app.core.metrics import BOOK_WRITES, DB_ROWS_READ, stage
+from app.core.normalize import normalize_text, split_names
 from app.models import Book
+from app.schemas import BookBase
+
+# Camps desats d'un llibre (sense id ni clau normalitzada)
+BOOK_BASE_FIELDS = frozenset(BookBase.model_fields)
+
+# Faceta -> (taula, taula d'unió, columna de la faceta a la unió, camp de Book)
+FACETS = {
+    "authors": ("authors", "book_authors", "author_id", "author"),
+    "categories": ("categories", "book_categories", "category_id", "categories"),
+}
 
 
 class BookRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create(self, book_data: Book) -> Book:
+    def create(self, book_data: BookBase) -> Book:
         """
         Crea un llibre nou. Si ja existeix (títol+autor normalitzats), retorna l'existent.
         """
-        # Comprova si el llibre ja existeix per títol+autor normalitzats
-        existing_book = self.find_by_title_author(
-            book_data.title, 
-            book_data.author
-        )
+        normalized_key = self.build_normalized_key(book_data.title, book_data.author)
+
+        # Comprova si el llibre ja existeix a través de l'índex de la clau normalitzada
+        with stage("dedup"):
+            existing_book = self.get_by_normalized_key(normalized_key)
         if existing_book:
+            BOOK_WRITES.labels("duplicate").inc()
             return existing_book
-        
-        book = Book.model_validate(book_data)
+
+        book = Book.model_validate(book_data, update={"normalized_key": normalized_key})
         self.db.add(book)
-        self.db.commit()
+        try:
+            with stage("db_write"):
+                self.db.flush()
+                self.link_facets([book])
+                self.db.commit()
+        except IntegrityError:
+            # Una altra petició l'ha inserit entre la consulta i el commit
+            self.db.rollback()
+            existing_book = self.get_by_normalized_key(normalized_key)
+            if existing_book:
+                BOOK_WRITES.labels("duplicate").inc()
+                return existing_book
+            raise
         self.db.refresh(book)
+        BOOK_WRITES.labels("inserted").inc()
         return book
 
+    def bulk_upsert(self, books_data: list[BookBase]) -> list[Book]:
+        """
+        Desa un lot de llibres amb un sol INSERT ... ON CONFLICT i un sol commit.
+
+        Els duplicats dins del lot s'eliminen abans d'inserir. Retorna els
+        llibres (nous o ja existents) en l'ordre d'entrada i sense repetir-los.
+        """
+        rows = self.prepare_upsert_rows(books_data)
+        if not rows:
+            return []
+
+        statement = self.upsert_statement()
+        try:
+            with stage("db_write"):
+                books = {
+                    book.normalized_key: book
+                    for book in self.db.scalars(statement, list(rows.values()))
+                }
+                self.link_facets(books.values())
+            inserted = len(books)
+
+            # Les files en conflicte no surten al RETURNING: es recuperen d'un sol cop
+            missing_keys = [key for key in rows if key not in books]
+            if missing_keys:
+                with stage("dedup"):
+                    existing = select(Book).where(Book.normalized_key.in_(missing_keys))
+                    books.update(
+                        (book.normalized_key, book) for book in self.db.exec(existing)
+                    )
+                DB_ROWS_READ.labels("bulk_upsert").inc(len(books) - inserted)
+
+            with stage("db_write"):
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        BOOK_WRITES.labels("inserted").inc(inserted)
+        BOOK_WRITES.labels("duplicate").inc(len(rows) - inserted)
+
+        return [books[key] for key in rows if key in books]
+
+    @classmethod
+    def prepare_upsert_rows(cls, books_data: list[BookBase]) -> dict[str, dict]:
+        """
+        Deduplica el lot per clau normalitzada, mantenint l'ordre.
+
+        Els llibres ja són `BookBase` validats: es bolquen directament en
+        lloc de tornar-los a validar com a `Book`, que instrumenta cada camp.
+        """
+        rows: dict[str, dict] = {}
+        for book_data in books_data:
+            normalized_key = cls.build_normalized_key(book_data.title, book_data.author)
+            if normalized_key in rows:
+                continue
+            row = book_data.model_dump(include=BOOK_BASE_FIELDS)
+            row["normalized_key"] = normalized_key
+            rows[normalized_key] = row
+        return rows
+
+    @staticmethod
+    def upsert_statement():
+        """INSERT ... ON CONFLICT sobre la clau normalitzada que retorna les files noves."""
+        return (
+            insert(Book)
+            .on_conflict_do_nothing(index_elements=[Book.normalized_key])
+            .returning(Book)
+        )
+
+    def link_facets(self, books: Iterable[Book]) -> None:
+        """Enllaça llibres acabats d'inserir amb els seus autors i categories."""
+        for facet, params in self.facet_params(books).items():
+            if params["keys"]:
+                names_statement, links_statement = self.facet_statements(facet)
+                self.db.execute(names_statement, params)
+                self.db.execute(links_statement, params)
+
+    @staticmethod
+    def facet_params(books: Iterable[Book]) -> dict[str, dict[str, list]]:
+        """
+        Paràmetres de `facet_statements` per a cada faceta d'un lot de llibres.
+
+        Els llibres poden ser `Book` o files amb `id`, `author` i `categories`.
+
+        Els noms es deduplicen pel nom normalitzat (es conserva la primera
+        grafia) i s'ordenen per clau: dues transaccions que insereixen els
+        mateixos noms bloquegen les files en el mateix ordre i no s'encallen.
+        """
+        books = list(books)
+        params = {}
+        for facet, (_, _, _, field) in FACETS.items():
+            names: dict[str, str] = {}
+            links: dict[str, list] = {"book_ids": [], "keys": [], "positions": []}
+            for book in books:
+                seen: set[str] = set()
+                for position, name in enumerate(split_names(getattr(book, field))):
+                    key = normalize_text(name)
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    names.setdefault(key, name)
+                    links["book_ids"].append(book.id)
+                    links["keys"].append(key)
+                    links["positions"].append(position)
+            name_keys = sorted(names)
+            params[facet] = {
+                "names": [names[key] for key in name_keys],
+                "name_keys": name_keys,
+                **links,
+            }
+        return params
+
+    @staticmethod
+    def facet_statements(facet: str) -> tuple:
+        """
+        Sentències que creen els noms que falten i les files d'unió d'una faceta.
+
+        Cada una envia tot el lot en arrays amb `unnest`: dues anades a la
+        base de dades per faceta, independentment de la mida del lot.
+        """
+        table, link_table, link_column, _ = FACETS[facet]
+        # Amb NOT EXISTS els noms que ja hi són no gasten valors de la seqüència d'id;
+        # ON CONFLICT cobreix els que insereix alhora una altra transacció
+        names = text(
+            f"INSERT INTO {table} (name, normalized_name) "
+            f"SELECT * FROM unnest(:names, :name_keys) AS new(name, normalized_name) "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {table}.normalized_name = new.normalized_name) "
+            f"ON CONFLICT (normalized_name) DO NOTHING"
+        ).bindparams(
+            bindparam("names", type_=ARRAY(String)),
+            bindparam("name_keys", type_=ARRAY(String)),
+        )
+        links = text(
+            f"INSERT INTO {link_table} (book_id, {link_column}, position) "
+            f"SELECT link.book_id, facet.id, link.position "
+            f"FROM unnest(:book_ids, :keys, :positions) AS link(book_id, normalized_name, position) "
+            f"JOIN {table} AS facet USING (normalized_name) "
+            f"ON CONFLICT DO NOTHING"
+        ).bindparams(
+            bindparam("book_ids", type_=ARRAY(Integer)),
+            bindparam("keys", type_=ARRAY(String)),
+            bindparam("positions", type_=ARRAY(Integer)),
+        )
+        return names, links
+
     def find_by_title_author(self, title: str, author: str) -> Book | None:
         """
         Cerca un llibre per títol i autor amb normalització.
         """
-        # Normalitza el títol i autor per comparar
-        normalized_title = self._normalize_text(title)
-        normalized_author = self._normalize_text(author)
-        
-        # Busca tots els llibres i compara normalitzat
-        statement = select(Book)
+        with stage("dedup"):
+            return self.get_by_normalized_key(self.build_normalized_key(title, author))
+
+    def get_by_normalized_key(self, normalized_key: str) -> Book | None:
+        """Cerca un llibre per la seva clau títol+autor normalitzada."""
+        statement = select(Book).where(Book.normalized_key == normalized_key)
         result = self.db.exec(statement)
-        books = result.all()
-        
-        for book in books:
-            if (self._normalize_text(book.title) == normalized_title and 
-                self._normalize_text(book.author) == normalized_author):
-                return book
-        
-        return None
-
-    def _normalize_text(self, text: str) -> str:
+        book = result.first()
+        if book is not None:
+            DB_ROWS_READ.labels("get_by_normalized_key").inc()
+        return book
+
+    @classmethod
+    def build_normalized_key(cls, title: str, author: str) -> str:
         """
-        Normalitza text per comparació de duplicats.
+        Construeix la clau de deduplicació a partir del títol i l'autor.
+
+        El separador `::` no pot aparèixer dins del text normalitzat perquè
+        `normalize_text` elimina els dos punts.
         """
-        if not text:
-            return ""
-        
-        # Minúscules
-        text = text.lower()
-        
-        # Accents (NFD + filtra caràcters no ASCII + NFC)
-        text = unicodedata.normalize('NFD', text)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        text = unicodedata.normalize('NFC', text)
-        
-        # Puntuació: ! ? ¿ ¡ . , ; : ( ) [ ] { } " ' 
-        text = re.sub(r'[!?¿¡.,;:\(\)\[\]{}"\']+', '', text)
-        
-        # Espais al principi i final, i espais múltiples
-        text = ' '.join(text.split())
-        
-        return text.strip()
+        return f"{normalize_text(title)}::{normalize_text(author)}"
 
     def get_by_id(self, book_id: int) -> Book | None:
         """Cerca un llibre pel seu ID."""
@@ -2,24 +2,66 @@
 
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 
 from app.api.v1.router import api_router
-from app.core.db import create_db_and_tables
+from app.clients import get_google_books_client, get_thumbnail_cache
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.db import async_engine, get_pool_stats
+from app.core.metrics import METRICS_ENABLED, ServerTimingMiddleware, render_metrics
+from app.services.write_behind import get_write_behind_queue
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    # L'esquema el prepara `python -m app.cli migrate` un sol cop, no cada worker
+    google_client = get_google_books_client()
+    await google_client.warmup()
+    write_queue = get_write_behind_queue()
+    if write_queue is not None:
+        write_queue.start()
+    thumbnails = get_thumbnail_cache()
+    thumbnails.start()
     yield
+    if write_queue is not None:
+        # Desa el que queda a la cua abans de tancar les connexions
+        await write_queue.close()
+    await thumbnails.close()
+    await google_client.close()
+    await async_engine.dispose()
 
 
 app = FastAPI(title="Book Tracker API", lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api/v1")
 
+if METRICS_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/metrics", tags=["Backend"], include_in_schema=False)
+    def metrics():
+        """Mètriques en format de text de Prometheus."""
+        content, media_type = render_metrics()
+        return Response(content, media_type=media_type)
+
+
+if settings.compression_enabled:
+    # Afegit l'últim, és el middleware més extern: comprimeix la resposta ja acabada
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
 
 @app.get("/", tags=["Backend"])
 def status():
     return {"status": "ok", "message": "Running"}
 
+
+@app.get("/health/db-pool", tags=["Backend"])
+def db_pool_status():
+    """Mètriques de checkout i espera dels pools de connexions."""
+    return {"pools": get_pool_stats()}
@@ -1,5 +1,15 @@
 """Paquet de models de dades."""
 
-from .book import Book
+from .book import BOOK_SEARCH_VECTOR, ISBN_IS_KNOWN, SEARCH_CONFIG, Book
+from .facets import Author, BookAuthor, BookCategory, Category
 
-__all__ = ["Book"]
+__all__ = [
+    "BOOK_SEARCH_VECTOR",
+    "ISBN_IS_KNOWN",
+    "SEARCH_CONFIG",
+    "Author",
+    "Book",
+    "BookAuthor",
+    "BookCategory",
+    "Category",
+]
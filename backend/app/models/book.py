@@ -1,7 +1,13 @@
 """Models de dades per a la base de dades."""
 
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, Computed, DateTime, Index, func, literal_column, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import UniqueConstraint, Field
 
+from app.core.isbn import ISBN_PLACEHOLDER
 from app.schemas import BookBase
 
 
@@ -10,4 +16,65 @@ class Book(BookBase, table=True):
     __tablename__ = "books"
     __table_args__ = (UniqueConstraint("title", "author", name="unique_book"),)
 
-    id: int = Field(primary_key=True)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Clau títol+autor normalitzats per detectar duplicats amb una cerca indexada
+    normalized_key: Optional[str] = Field(
+        default=None, nullable=False, unique=True, index=True
+    )
+    # Darrera modificació: la posa la base de dades en inserir i SQLAlchemy en
+    # cada UPDATE. Fa de validador de les respostes (ETag i Last-Modified)
+    updated_at: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now(), "onupdate": func.now()},
+    )
+    # Darrera vegada que se n'han demanat les metadades a Google; el refresc
+    # incremental torna a demanar els llibres més antics. Els llibres anteriors
+    # a la columna hi tenen l'època Unix (mai refrescats)
+    fetched_at: Optional[datetime] = Field(
+        default=None,
+        nullable=False,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now()},
+    )
+
+
+# Configuració 'simple': el catàleg és multilingüe i no volem stemming per idioma
+SEARCH_CONFIG = text("'simple'::regconfig")
+
+# Document de text complet (títol, autor i descripció), desat com a columna
+# generada: l'índex GIN el fa servir directament i el rànquing no ha de
+# recalcular to_tsvector de descripcions llargues per a cada candidat
+Book.__table__.append_column(
+    Column(
+        "search_vector",
+        TSVECTOR,
+        Computed(
+            "to_tsvector('simple'::regconfig, coalesce(title, '') || ' ' || "
+            "coalesce(author, '') || ' ' || coalesce(description, ''))",
+            persisted=True,
+        ),
+    )
+)
+# No és un camp del model: només s'usa en consultes i no es carrega amb el llibre
+BOOK_SEARCH_VECTOR = Book.__table__.c.search_vector
+
+Index("ix_books_search_vector", BOOK_SEARCH_VECTOR, postgresql_using="gin")
+Index(
+    "ix_books_title_trgm",
+    Book.title,
+    postgresql_using="gin",
+    postgresql_ops={"title": "gin_trgm_ops"},
+)
+
+# Índex parcial: els llibres sense ISBN comparteixen el mateix valor de relleu
+ISBN_IS_KNOWN = Book.isbn != literal_column(f"'{ISBN_PLACEHOLDER}'")
+Index("ix_books_isbn", Book.isbn, postgresql_where=ISBN_IS_KNOWN)
+# Cua del refresc: només es refresquen els llibres amb ISBN, del més antic al més nou
+Index("ix_books_fetched_at", Book.fetched_at, postgresql_where=ISBN_IS_KNOWN)
+
+# Índexs per al llistat paginat per clau: (ordenació, id) i filtres + id
+Index("ix_books_title_id", Book.title, Book.id)
+Index("ix_books_language_id", Book.language, Book.id)
+Index("ix_books_author_id", Book.author, Book.id)
@@ -0,0 +1,57 @@
+"""Models d'autors i categories normalitzats, amb les taules d'unió amb llibres."""
+
+from typing import Optional
+
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class Author(SQLModel, table=True):
+    """Autor identificat pel nom normalitzat (sense accents ni puntuació)."""
+    __tablename__ = "authors"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    # Primera grafia desada del nom
+    name: str
+    normalized_name: str
+
+
+class Category(SQLModel, table=True):
+    """Categoria identificada pel nom normalitzat."""
+    __tablename__ = "categories"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+    normalized_name: str
+
+
+class BookAuthor(SQLModel, table=True):
+    """Unió llibre-autor; `position` conserva l'ordre de la llista d'autors."""
+    __tablename__ = "book_authors"
+
+    book_id: int = Field(foreign_key="books.id", primary_key=True, ondelete="CASCADE")
+    author_id: int = Field(foreign_key="authors.id", primary_key=True, ondelete="CASCADE")
+    position: int = 0
+
+
+class BookCategory(SQLModel, table=True):
+    """Unió llibre-categoria."""
+    __tablename__ = "book_categories"
+
+    book_id: int = Field(foreign_key="books.id", primary_key=True, ondelete="CASCADE")
+    category_id: int = Field(foreign_key="categories.id", primary_key=True, ondelete="CASCADE")
+    position: int = 0
+
+
+# Únics per nom normalitzat; text_pattern_ops permet també cercar per prefix (LIKE 'x%')
+for _model in (Author, Category):
+    Index(
+        f"ix_{_model.__tablename__}_normalized_name",
+        _model.normalized_name,
+        unique=True,
+        postgresql_ops={"normalized_name": "text_pattern_ops"},
+    )
+
+# La clau primària comença pel llibre: per filtrar llibres per faceta cal l'índex invers
+Index("ix_book_authors_author_id_book_id", BookAuthor.author_id, BookAuthor.book_id)
+Index("ix_book_categories_category_id_book_id", BookCategory.category_id, BookCategory.book_id)
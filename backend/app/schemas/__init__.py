@@ -1,5 +1,23 @@
 """Paquet d'esquemes de validació per a l'API."""
 
-from .book import BookBase, BookCreate, BookUpdate, BookResponse, BookSearchResponse
+from .book import (
+    BookBase,
+    BookCreate,
+    BookUpdate,
+    BookPage,
+    BookResponse,
+    BookSearchResponse,
+    FacetCount,
+    IsbnBatchRequest,
+)
 
-__all__ = ["BookBase", "BookCreate", "BookUpdate", "BookResponse", "BookSearchResponse"]
+__all__ = [
+    "BookBase",
+    "BookCreate",
+    "BookUpdate",
+    "BookPage",
+    "BookResponse",
+    "BookSearchResponse",
+    "FacetCount",
+    "IsbnBatchRequest",
+]
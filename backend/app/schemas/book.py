@@ -1,8 +1,8 @@
 """Esquemes de validació per a l'API."""
 
-from datetime import date
-from typing import Optional
-from sqlmodel import SQLModel
+from datetime import date, datetime
+from typing import Any, Literal, Optional
+from sqlmodel import Field, SQLModel
 
 
 class BookBase(SQLModel):
@@ -37,7 +37,9 @@ class BookUpdate(SQLModel):
 
 class BookResponse(BookBase):
     """Esquema de resposta de l'API."""
-    id: int
+    # None si el llibre encara és a la cua write-behind
+    id: Optional[int] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -47,4 +49,23 @@ class BookSearchResponse(SQLModel):
     """Esquema per respostes de cerca."""
     query: str
     total_results: int
+    source: Literal["local", "google"]
     books: list[BookResponse]
+
+
+class BookPage(SQLModel):
+    """Esquema per una pàgina del llistat de llibres."""
+    books: list[dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class FacetCount(SQLModel):
+    """Esquema d'un autor o una categoria amb el nombre de llibres."""
+    id: int
+    name: str
+    book_count: int
+
+
+class IsbnBatchRequest(SQLModel):
+    """Esquema per cercar molts llibres per ISBN d'un sol cop."""
+    isbns: list[str] = Field(min_length=1, max_length=1000)
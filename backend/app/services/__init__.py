@@ -1,6 +1,7 @@
 """Paquet de serveis de lògica de negoci."""
 
 from .book_service import BookService
+from .catalog_service import CatalogService
 
-__all__ = ["BookService"]
+__all__ = ["BookService", "CatalogService"]
 
@@ -0,0 +1,196 @@
+"""Servei d'exportació i importació massiva del catàleg."""
+
+import asyncio
+import csv
+import io
+import logging
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import datetime, timezone
+from typing import Literal
+
+import orjson
+from pydantic import ValidationError
+
+from app.crud import AsyncBookRepository
+from app.crud.async_book_repository import EXPORT_COLUMNS
+from app.crud.book_repository import BookRepository
+from app.schemas import BookBase
+
+logger = logging.getLogger(__name__)
+
+CatalogFormat = Literal["ndjson", "csv"]
+
+# `fetched_at` dels llibres importats sense data: mai refrescats, com els
+# anteriors a la columna, de manera que el refresc els demana primer
+NEVER_FETCHED = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class InvalidImportFile(ValueError):
+    """El fitxer a importar no es pot llegir (per exemple, no és UTF-8)."""
+
+
+class StreamLines:
+    """
+    Línies (en bytes) d'un flux asíncron de blocs, per llegir-les des d'un fil.
+
+    El parser de la importació corre en un fil; cada bloc es demana a l'event
+    loop amb `run_coroutine_threadsafe`. Així el cos de la petició es parseja
+    a mesura que arriba, sense bolcar-lo abans a disc.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], loop: asyncio.AbstractEventLoop):
+        self.chunks = chunks
+        self.loop = loop
+
+    def __iter__(self) -> Iterator[bytes]:
+        buffer = b""
+        while (chunk := self._next_chunk()) is not None:
+            buffer += chunk
+            start = 0
+            while (end := buffer.find(b"\n", start)) != -1:
+                yield buffer[start:end + 1]
+                start = end + 1
+            buffer = buffer[start:]
+        if buffer:
+            yield buffer
+
+    def _next_chunk(self) -> bytes | None:
+        future = asyncio.run_coroutine_threadsafe(anext(self.chunks, None), self.loop)
+        return future.result()
+
+
+class CatalogService:
+    """Exporta i importa el catàleg en streaming amb memòria constant."""
+
+    # Mida aproximada dels blocs HTTP de l'exportació NDJSON
+    CHUNK_SIZE = 64 * 1024
+    # Files per lot de COPY a la importació
+    IMPORT_BATCH_SIZE = 5000
+
+    def __init__(self, db_repo: AsyncBookRepository):
+        self.repo = db_repo
+
+    async def export(self, fmt: CatalogFormat) -> AsyncIterator[bytes]:
+        """Genera el catàleg sencer en NDJSON o CSV, per blocs."""
+        if fmt == "csv":
+            async for chunk in self.repo.copy_out_csv():
+                yield chunk
+            return
+
+        buffer = io.BytesIO()
+        async for row in self.repo.stream_rows():
+            buffer.write(orjson.dumps(dict(row), default=str, option=orjson.OPT_APPEND_NEWLINE))
+            if buffer.tell() >= self.CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer = io.BytesIO()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    async def import_stream(self, chunks: AsyncIterator[bytes], fmt: CatalogFormat) -> dict:
+        """Importa un catàleg que arriba per blocs (el cos d'una petició HTTP)."""
+        return await self.import_file(StreamLines(chunks, asyncio.get_running_loop()), fmt)
+
+    async def import_file(self, lines: Iterable[bytes], fmt: CatalogFormat) -> dict:
+        """
+        Importa un fitxer NDJSON o CSV (qualsevol iterable de línies en bytes).
+
+        Les files es validen amb `BookBase`; les invàlides es descarten i es
+        compten. El parseig es fa per lots en un fil per no bloquejar
+        l'event loop. Es conserva el `fetched_at` del fitxer; les files que
+        no en porten queden com a mai refrescades.
+        """
+        counters = {"received": 0, "invalid": 0}
+        records = self._parse_records(lines, fmt, counters)
+
+        async def batches() -> AsyncIterator[list[tuple]]:
+            # Es parseja el lot següent mentre el COPY de l'actual és en curs
+            pending = asyncio.ensure_future(asyncio.to_thread(self._next_batch, records))
+            try:
+                while batch := await pending:
+                    pending = asyncio.ensure_future(
+                        asyncio.to_thread(self._next_batch, records)
+                    )
+                    yield batch
+            finally:
+                pending.cancel()
+
+        result = await self.repo.import_via_staging(batches())
+        return {**counters, **result}
+
+    def _next_batch(self, records: Iterator[tuple]) -> list[tuple]:
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.IMPORT_BATCH_SIZE:
+                break
+        return batch
+
+    def _parse_records(
+        self, lines: Iterable[bytes], fmt: CatalogFormat, counters: dict
+    ) -> Iterator[tuple]:
+        """
+        Converteix cada fila vàlida en una tupla en l'ordre d'IMPORT_COLUMNS.
+
+        Una línia NDJSON que no és UTF-8 o no és un objecte JSON compta com a
+        fila invàlida; un CSV que no és UTF-8 llança InvalidImportFile.
+        """
+        if fmt == "csv":
+            rows = csv.DictReader(self._text_lines(lines))
+        else:
+            # orjson valida l'UTF-8 de cada línia en parsejar-la
+            rows = (line for line in lines if line.strip())
+
+        for row in rows:
+            counters["received"] += 1
+            try:
+                if isinstance(row, bytes):
+                    row = orjson.loads(row)
+                if not isinstance(row, dict):
+                    raise ValueError(f"s'esperava un objecte JSON, no {type(row).__name__}")
+                row = self._clean_row(row)
+                fetched_at = self._parse_fetched_at(row.pop("fetched_at", None))
+                book = BookBase.model_validate(row)
+            except (ValidationError, ValueError) as e:
+                counters["invalid"] += 1
+                logger.warning(f"Fila {counters['received']} descartada: {e}")
+                continue
+            values = book.model_dump()
+            yield (
+                *values.values(),
+                fetched_at,
+                BookRepository.build_normalized_key(book.title, book.author),
+            )
+
+    @staticmethod
+    def _parse_fetched_at(value: str | None) -> datetime:
+        """
+        `fetched_at` exportat (ISO 8601 al NDJSON, format de PostgreSQL al CSV).
+
+        Sense valor es retorna NEVER_FETCHED; sense zona horària, UTC.
+        """
+        if value is None:
+            return NEVER_FETCHED
+        if not isinstance(value, str):
+            raise ValueError(f"fetched_at no vàlid: {value!r}")
+        fetched_at = datetime.fromisoformat(value)
+        if fetched_at.tzinfo is None:
+            fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+        return fetched_at
+
+    @staticmethod
+    def _text_lines(lines: Iterable[bytes]) -> Iterator[str]:
+        """Línies del fitxer descodificades; les cel·les entre cometes poden ocupar-ne diverses."""
+        for number, line in enumerate(lines, 1):
+            try:
+                yield line.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise InvalidImportFile(f"La línia {number} no és UTF-8 vàlid") from e
+
+    @staticmethod
+    def _clean_row(row: dict) -> dict:
+        """Descarta l'id exportat i tracta les cel·les buides com a nul·les."""
+        return {
+            key: (None if value == "" else value)
+            for key, value in row.items()
+            if key in EXPORT_COLUMNS and key != "id"
+        }
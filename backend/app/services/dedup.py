@@ -0,0 +1,376 @@
+"""
+Detecció fora de línia de llibres duplicats en tot el catàleg.
+
+La deduplicació en inserir només veu coincidències exactes de la clau
+normalitzada. Aquest treball troba també edicions del mateix llibre:
+
+1. ISBN: l'ISBN-10 i l'ISBN-13 d'un mateix llibre són el mateix.
+2. Títol sense subtítol i primer autor: "Títol" i "Títol (edició de
+   butxaca)" són el mateix llibre; dos títols amb subtítols diferents
+   només ho són si a més s'assemblen (pas 3).
+3. Semblança: MinHash sobre els trigrames de títol i autor, amb LSH
+   (bandes de la signatura) per trobar candidats sense comparar totes les
+   parelles. Es confirmen els que superen el llindar de Jaccard estimat.
+   La signatura és d'una sola permutació (un hash per trigrama repartit
+   en `num_perm` caselles, amb densificació per rotació de les buides):
+   el cost és proporcional als trigrames i no a trigrames × permutacions.
+
+Cada pas és un bloqueig per ordenació: per a cada clau es desa un enter de
+64 bits (clau << 32 | ordinal), s'ordena i es recorren els grups de claus
+iguals. La memòria és lineal i compacta (arrays, no objectes per fila) i el
+temps, quasi lineal. El càlcul de signatures, que és la part cara, es
+reparteix en un pool de processos. Els grups es formen amb union-find i es
+desen en un informe NDJSON, un grup per línia.
+"""
+
+import asyncio
+import logging
+import operator
+import os
+import random
+from array import array
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from hashlib import blake2b
+from typing import IO
+from zlib import crc32
+
+import orjson
+
+from app.core.isbn import canonical_isbn
+from app.core.normalize import normalize_text, split_names, strip_subtitle
+from app.crud import AsyncBookRepository
+
+logger = logging.getLogger(__name__)
+
+# Títol que desa el client de Google quan un volum no en té: no identifica res
+UNTITLED = normalize_text("Sense títol")
+
+# Primer de Mersenne per a la permutació (a * h + b) mod p dels hashes dels trigrames
+_PRIME = (1 << 61) - 1
+_EMPTY = 1 << 32
+# Desplaçament de les caselles buides segons la distància a la que copien
+_DENSIFY = 0x9E3779B1
+
+# Columnes dels llibres a l'informe
+REPORT_COLUMNS = ["id", "title", "author", "isbn", "publisher", "publisher_date"]
+
+
+def _hash64(text: str) -> int:
+    """Hash estable (no depèn de PYTHONHASHSEED) de 64 bits, sense el 0."""
+    return int.from_bytes(blake2b(text.encode(), digest_size=8).digest(), "little") or 1
+
+
+@lru_cache()
+def _permutation(seed: int) -> tuple[int, int]:
+    rnd = random.Random(seed)
+    return rnd.randrange(1, _PRIME), rnd.randrange(0, _PRIME)
+
+
+def minhash(text: str, num_perm: int, seed: int) -> list[int]:
+    """Signatura MinHash d'una permutació dels trigrames del text, de `num_perm` valors de 32 bits."""
+    a, b = _permutation(seed)
+    signature = [_EMPTY] * num_perm
+    for i in range(max(1, len(text) - 2)):
+        bucket, value = divmod((a * crc32(text[i:i + 3].encode()) + b) % _PRIME, 1 << 32)
+        bucket %= num_perm
+        if value < signature[bucket]:
+            signature[bucket] = value
+    # Cada casella buida pren el valor de la següent plena (circularment), desplaçat per la distància
+    filled = [i for i, value in enumerate(signature) if value != _EMPTY]
+    if len(filled) < num_perm:
+        source = signature[:]
+        position = 0
+        for i in range(num_perm):
+            if source[i] != _EMPTY:
+                continue
+            while position < len(filled) and filled[position] < i:
+                position += 1
+            j = filled[position] if position < len(filled) else filled[0] + num_perm
+            signature[i] = (source[j % num_perm] + (j - i) * _DENSIFY) & 0xFFFFFFFF
+    return signature
+
+
+def book_features(
+    rows: list[tuple], num_perm: int, rows_per_band: int, seed: int
+) -> tuple[bytes, ...]:
+    """
+    Calcula les claus de bloqueig i la signatura MinHash d'un lot de llibres.
+
+    S'executa als processos del pool; retorna arrays serialitzats (un
+    element per llibre, o `num_perm` i una banda per llibre) perquè el
+    traspàs entre processos sigui barat. Les claus a 0 volen dir "sense clau".
+    """
+    bands_per_row = num_perm // rows_per_band
+    ids, isbns, cores = array("q"), array("Q"), array("Q")
+    subtitled = bytearray()
+    signatures, bands = array("I"), array("I")
+    for book_id, title, author, isbn in rows:
+        ids.append(book_id)
+        isbn13 = canonical_isbn(isbn)
+        isbns.append(int(isbn13) if isbn13 else 0)
+
+        names = split_names(author)
+        first_author = normalize_text(names[0]) if names else ""
+        full = normalize_text(title)
+        if not full or full == UNTITLED:
+            cores.append(0)
+            subtitled.append(0)
+            signatures.extend([0] * num_perm)
+            bands.extend([0] * bands_per_row)
+            continue
+
+        core = normalize_text(strip_subtitle(title)) or full
+        cores.append(_hash64(f"{core}::{first_author}"))
+        subtitled.append(core != full)
+
+        signature = minhash(f"{full} {first_author}", num_perm, seed)
+        signatures.extend(signature)
+        for start in range(0, bands_per_row * rows_per_band, rows_per_band):
+            band = array("I", signature[start:start + rows_per_band]).tobytes()
+            bands.append(crc32(band) or 1)
+    return (
+        ids.tobytes(), isbns.tobytes(), cores.tobytes(), bytes(subtitled),
+        signatures.tobytes(), bands.tobytes(),
+    )
+
+
+class DuplicateFinder:
+    """
+    Troba grups de llibres duplicats en una passada pel catàleg.
+
+    `threshold` és el Jaccard estimat mínim entre els trigrames de dos
+    llibres per considerar-los el mateix. Amb `num_perm` permutacions en
+    bandes de `rows_per_band`, dues signatures amb Jaccard s són candidates
+    amb probabilitat 1 - (1 - s^r)^b; els valors per defecte (32 en bandes
+    de 4) ho fan a partir de ~0,6 i deixen el llindar de 0,7 amb poques
+    pèrdues. Els grups de candidats de més de `max_bucket` llibres (títols
+    molt genèrics) se salten.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.7,
+        num_perm: int = 32,
+        rows_per_band: int = 4,
+        max_bucket: int = 200,
+        workers: int | None = None,
+        chunk_size: int = 2000,
+        seed: int = 1,
+    ):
+        if num_perm % rows_per_band:
+            raise ValueError("num_perm ha de ser múltiple de rows_per_band")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.rows_per_band = rows_per_band
+        self.bands_per_row = num_perm // rows_per_band
+        self.max_bucket = max_bucket
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.seed = seed
+
+        self.ids = array("q")
+        self.isbns = array("Q")
+        self.cores = array("Q")
+        self.subtitled = bytearray()
+        self.signatures = array("I")
+        self.bands = array("I")
+        self.parent = array("q")
+        self.groups: list[list[int]] = []
+        # Unions que han format els grups: (ordinal, ordinal, motiu, semblança)
+        self.matches: list[tuple[int, int, str, float]] = []
+        self.skipped_buckets = 0
+
+    async def scan(self, repo: AsyncBookRepository) -> None:
+        """Llegeix el catàleg i calcula les claus de cada llibre al pool de processos."""
+        loop = asyncio.get_running_loop()
+        params = (self.num_perm, self.rows_per_band, self.seed)
+        workers = self.workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(workers) as pool:
+            # Com a molt dos lots per procés en vol: la lectura no s'avança gaire al càlcul
+            pending: deque[asyncio.Future] = deque()
+            max_pending = 2 * workers
+            chunk = []
+            async for row in repo.stream_rows(
+                batch_size=self.chunk_size, columns=["id", "title", "author", "isbn"]
+            ):
+                chunk.append((row["id"], row["title"], row["author"], row["isbn"]))
+                if len(chunk) == self.chunk_size:
+                    pending.append(loop.run_in_executor(pool, book_features, chunk, *params))
+                    chunk = []
+                    if len(pending) >= max_pending:
+                        self._add(await pending.popleft())
+            if chunk:
+                pending.append(loop.run_in_executor(pool, book_features, chunk, *params))
+            while pending:
+                self._add(await pending.popleft())
+
+    def _add(self, features: tuple[bytes, ...]) -> None:
+        ids, isbns, cores, subtitled, signatures, bands = features
+        self.ids.frombytes(ids)
+        self.isbns.frombytes(isbns)
+        self.cores.frombytes(cores)
+        self.subtitled.extend(subtitled)
+        self.signatures.frombytes(signatures)
+        self.bands.frombytes(bands)
+
+    def match(self) -> None:
+        """
+        Agrupa els llibres pas a pas: ISBN, títol sense subtítol i bandes LSH.
+
+        Els passos més segurs van primer; quan un grup de candidats ja és
+        tot del mateix grup, els passos següents no fan cap comparació.
+        """
+        count = len(self.ids)
+        self.parent = array("q", range(count))
+        self.matches = []
+        self.skipped_buckets = 0
+
+        self._match_blocks(self.isbns, "isbn", self._same_isbn)
+        self._match_blocks(self.cores, "title", self._same_title)
+        stride = self.bands_per_row
+        for band in range(stride):
+            self._match_blocks(self.bands[band::stride], "similar", self._similar)
+        self.groups = self._groups()
+        if self.skipped_buckets:
+            logger.warning(
+                f"{self.skipped_buckets} grups LSH de més de {self.max_bucket} llibres no s'han comparat"
+            )
+
+    def _match_blocks(self, keys: array, reason: str, verify) -> None:
+        """Ordena per clau (32 bits baixos) i compara dins de cada grup de claus iguals."""
+        packed = array("Q", (
+            (key & 0xFFFFFFFF) << 32 | ordinal for ordinal, key in enumerate(keys) if key
+        ))
+        block: list[int] = []
+        current = None
+        for value in sorted(packed):
+            key = value >> 32
+            if key != current:
+                self._match_block(block, reason, verify)
+                block = []
+                current = key
+            block.append(value & 0xFFFFFFFF)
+        self._match_block(block, reason, verify)
+
+    def _match_block(self, block: list[int], reason: str, verify) -> None:
+        """
+        Compara cada llibre amb un representant de cada grup ja present al bloc.
+
+        Els ordinals arriben ordenats: el primer representant d'un grup és
+        el seu llibre més antic.
+        """
+        if len(block) < 2:
+            return
+        if reason == "similar" and len(block) > self.max_bucket:
+            self.skipped_buckets += 1
+            return
+        representatives: dict[int, int] = {}
+        for ordinal in block:
+            root = self._find(ordinal)
+            if root in representatives:
+                continue
+            for other_root, other in list(representatives.items()):
+                score = verify(other, ordinal)
+                if score is not None:
+                    self._union(other_root, root)
+                    self.matches.append((other, ordinal, reason, score))
+                    break
+            else:
+                representatives[root] = ordinal
+
+    def _same_isbn(self, a: int, b: int) -> float | None:
+        return 1.0 if self.isbns[a] == self.isbns[b] else None
+
+    def _same_title(self, a: int, b: int) -> float | None:
+        if self.cores[a] != self.cores[b]:
+            return None
+        score = self._similarity(a, b)
+        # "Títol" i "Títol: subtítol" sí; dos subtítols diferents, només si s'assemblen
+        if not (self.subtitled[a] and self.subtitled[b]) or score >= self.threshold:
+            return score
+        return None
+
+    def _similar(self, a: int, b: int) -> float | None:
+        score = self._similarity(a, b)
+        return score if score >= self.threshold else None
+
+    def _similarity(self, a: int, b: int) -> float:
+        """Jaccard estimat: fracció de posicions iguals de les dues signatures."""
+        k = self.num_perm
+        first = self.signatures[a * k:(a + 1) * k]
+        second = self.signatures[b * k:(b + 1) * k]
+        return sum(map(operator.eq, first, second)) / k
+
+    def _find(self, ordinal: int) -> int:
+        parent = self.parent
+        while parent[ordinal] != ordinal:
+            parent[ordinal] = parent[parent[ordinal]]
+            ordinal = parent[ordinal]
+        return ordinal
+
+    def _union(self, a: int, b: int) -> None:
+        # L'arrel és sempre l'ordinal més baix: el llibre canònic és el més antic
+        a, b = self._find(a), self._find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def _groups(self) -> list[list[int]]:
+        """Grups de més d'un llibre, com a llistes d'ordinals ordenades, pel canònic."""
+        groups: dict[int, list[int]] = {}
+        for ordinal in range(len(self.ids)):
+            root = self._find(ordinal)
+            if root != ordinal:
+                groups.setdefault(root, [root]).append(ordinal)
+        return [groups[root] for root in sorted(groups)]
+
+    async def write_report(
+        self, repo: AsyncBookRepository, output: IO[bytes], batch_size: int = 1000
+    ) -> None:
+        """
+        Escriu un grup per línia: llibre canònic, llibres i unions amb motiu i semblança.
+
+        Les dades dels llibres es llegeixen per lots d'ids: durant la
+        passada només es guarden claus, no títols.
+        """
+        matches_by_root: dict[int, list[tuple[int, int, str, float]]] = {}
+        for match in self.matches:
+            matches_by_root.setdefault(self._find(match[0]), []).append(match)
+
+        async def write(groups: list[list[int]]) -> None:
+            ids = [self.ids[ordinal] for group in groups for ordinal in group]
+            rows = await repo.get_rows_by_ids(ids, columns=REPORT_COLUMNS)
+            books = {row["id"]: dict(row) for row in rows}
+            for group in groups:
+                output.write(orjson.dumps({
+                    "canonical_id": self.ids[group[0]],
+                    "size": len(group),
+                    # Un llibre esborrat durant la passada surt només amb l'id
+                    "books": [books.get(self.ids[o], {"id": self.ids[o]}) for o in group],
+                    "matches": [
+                        {"ids": [self.ids[a], self.ids[b]], "reason": reason, "score": round(score, 3)}
+                        for a, b, reason, score in matches_by_root[group[0]]
+                    ],
+                }, default=str, option=orjson.OPT_APPEND_NEWLINE))
+
+        pending: list[list[int]] = []
+        pending_size = 0
+        for group in self.groups:
+            pending.append(group)
+            pending_size += len(group)
+            if pending_size >= batch_size:
+                await write(pending)
+                pending, pending_size = [], 0
+        if pending:
+            await write(pending)
+
+    def summary(self) -> dict:
+        """Comptadors del darrer `match`."""
+        return {
+            "books": len(self.ids),
+            "clusters": len(self.groups),
+            "duplicates": sum(len(group) - 1 for group in self.groups),
+            "matches": dict(Counter(reason for _, _, reason, _ in self.matches)),
+            "skipped_buckets": self.skipped_buckets,
+        }
@@ -0,0 +1,162 @@
+"""
+Refresc incremental de les metadades de Google dels llibres desats.
+
+Un llibre desat no es torna a demanar a Google, i les miniatures, el nombre
+de pàgines o les descripcions poden canviar o aparèixer més tard. El refresc
+recorre el catàleg pels llibres demanats fa més temps (`fetched_at`):
+
+1. Reserva un lot amb `FOR UPDATE SKIP LOCKED` i en el mateix pas els posa
+   `fetched_at = now()`, de manera que diversos processos poden refrescar
+   alhora sense repetir llibres ni mantenir transaccions obertes.
+2. Torna a demanar cada llibre per ISBN, amb concurrència limitada i dins
+   d'un pressupost de peticions propi (a més de la quota general, amb
+   prioritat baixa perquè no prengui quota a les cerques dels usuaris).
+3. Desa només els camps que han canviat; els camps buits de Google no
+   esborren els desats. Si el llibre s'ha modificat entretant, no es toca.
+
+Les peticions que fallen per quota, per xarxa o perquè Google no respon
+desfan la reserva i es tornen a provar; les que fallen per un error de la
+petició (4xx) esperen el següent refresc.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from app.clients import GoogleBooksClient
+from app.clients.rate_limit import RateLimiter, RateLimitExceeded
+from app.clients.resilience import CircuitOpenError
+from app.core.config import settings
+from app.core.isbn import normalize_isbn, same_isbn
+from app.core.metrics import BOOK_REFRESHES
+from app.crud import AsyncBookRepository
+from app.crud.async_book_repository import REFRESH_COLUMNS
+from app.schemas import BookBase
+
+logger = logging.getLogger(__name__)
+
+# Valors que el client de Google posa quan el volum no té el camp
+BLANK_VALUES = (None, "", 0, "und")
+
+
+def matching_volume(isbn: str, volumes: list[BookBase]) -> BookBase | None:
+    """El primer volum amb el mateix ISBN (en qualsevol de les dues longituds)."""
+    return next((volume for volume in volumes if same_isbn(isbn, volume.isbn)), None)
+
+
+def metadata_changes(stored: Mapping, fresh: BookBase) -> dict:
+    """Camps refrescables de `fresh` que no estan buits i difereixen dels desats."""
+    changes = {}
+    for name in REFRESH_COLUMNS:
+        value = getattr(fresh, name)
+        if value not in BLANK_VALUES and value != stored[name]:
+            changes[name] = value
+    return changes
+
+
+class MetadataRefresher:
+    """Refresca per lots els llibres demanats a Google fa més de `max_age`."""
+
+    def __init__(
+        self,
+        db_repo: AsyncBookRepository,
+        google_client: GoogleBooksClient,
+        rate_limiter: RateLimiter,
+        max_age: timedelta,
+        batch_size: int = 100,
+        concurrency: int = 4,
+    ):
+        self.repo = db_repo
+        self.google_client = google_client
+        self.rate_limiter = rate_limiter
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.counts: Counter[str] = Counter()
+        self.batches = 0
+
+    async def run(
+        self, max_batches: int | None = None, follow: bool = False, idle_seconds: float = 300
+    ) -> dict:
+        """
+        Refresca lots fins que no en queda cap d'obsolet o fins a `max_batches`.
+
+        Amb `follow` no s'acaba mai: quan no hi ha feina, o quan cap llibre
+        del lot s'ha pogut demanar (Google no disponible), espera
+        `idle_seconds` i ho torna a provar. Retorna `summary()`.
+        """
+        while max_batches is None or self.batches < max_batches:
+            claimed, deferred = await self.refresh_batch()
+            if claimed and deferred < claimed:
+                continue
+            if not follow:
+                if claimed:
+                    logger.warning("Refresc aturat: no s'ha pogut demanar cap llibre del lot a Google")
+                break
+            await asyncio.sleep(idle_seconds)
+        return self.summary()
+
+    async def refresh_batch(self) -> tuple[int, int]:
+        """Refresca un lot; retorna els llibres reservats i els que s'han hagut de deixar."""
+        fetched_before = datetime.now(timezone.utc) - self.max_age
+        claimed = await self.repo.claim_stale(fetched_before, self.batch_size)
+        if not claimed:
+            return 0, 0
+        self.batches += 1
+
+        results = await asyncio.gather(*(self._fetch(row) for row in claimed))
+        changes: dict[int, tuple[datetime, dict]] = {}
+        released = []
+        for row, (result, volume) in zip(claimed, results):
+            if result == "deferred":
+                released.append((row["id"], row["previous_fetched_at"]))
+                continue
+            if result == "fetched":
+                fields = metadata_changes(row, volume)
+                if fields:
+                    changes[row["id"]] = (row["updated_at"], fields)
+                    continue
+                result = "unchanged"
+            self._count(result)
+
+        if changes:
+            updated = await self.repo.update_refreshed(changes)
+            self._count("updated", len(updated))
+            # Modificats per una altra petició després de la reserva
+            self._count("conflict", len(changes) - len(updated))
+        if released:
+            await self.repo.release_claims(released)
+            self._count("deferred", len(released))
+        return len(claimed), len(released)
+
+    async def _fetch(self, row: Mapping) -> tuple[str, BookBase | None]:
+        """Demana un llibre per ISBN; retorna el resultat i el volum trobat."""
+        isbn = normalize_isbn(row["isbn"]) or row["isbn"]
+        async with self.semaphore:
+            await self.rate_limiter.acquire()
+            try:
+                volumes = await self.google_client.search_books(
+                    f"isbn:{isbn}", settings.isbn_lookup_candidates, priority="low", use_cache=False
+                )
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status == 429 or status >= 500:
+                    return "deferred", None
+                logger.warning(f"Google Books ha respost {status} refrescant l'ISBN {isbn}")
+                return "error", None
+            except (CircuitOpenError, RateLimitExceeded, httpx.HTTPError):
+                return "deferred", None
+        volume = matching_volume(isbn, volumes)
+        return ("fetched", volume) if volume is not None else ("not_found", None)
+
+    def _count(self, result: str, amount: int = 1) -> None:
+        self.counts[result] += amount
+        BOOK_REFRESHES.labels(result).inc(amount)
+
+    def summary(self) -> dict:
+        """Lots processats i llibres per resultat."""
+        return {"batches": self.batches, **self.counts}
@@ -0,0 +1,134 @@
+"""Cua write-behind: desa en segon pla els llibres obtinguts de Google."""
+
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from functools import lru_cache
+
+from app.core.config import settings
+from app.core.db import async_session_maker
+from app.core.metrics import WRITE_QUEUE_BOOKS, WRITE_QUEUE_DEPTH, WRITE_QUEUE_FLUSH_SECONDS
+from app.crud import AsyncBookRepository
+from app.schemas import BookBase
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """
+    Cua acotada amb un worker que desa els llibres per lots.
+
+    Quan la cua és plena, `put` espera com a màxim `put_timeout` (pressió
+    enrere sobre les peticions) i retorna els llibres que no hi han cabut
+    perquè el cridador els desi en línia: no es descarta cap llibre.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        put_timeout: float,
+        drain_timeout: float,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.drain_timeout = drain_timeout
+        self._queue: asyncio.Queue[BookBase] | None = None
+        self._worker: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Crea la cua i el worker a l'event loop actual."""
+        if self._worker is None:
+            self._queue = asyncio.Queue(self.max_size)
+            self._worker = asyncio.create_task(self._run(), name="write-behind")
+
+    async def put(self, books: list[BookBase]) -> list[BookBase]:
+        """Encua els llibres i retorna els que no hi caben a temps."""
+        if self._worker is None or self._worker.done():
+            return list(books)
+
+        queued = 0
+        try:
+            async with asyncio.timeout(self.put_timeout):
+                for book in books:
+                    await self._queue.put(book)
+                    queued += 1
+        except TimeoutError:
+            WRITE_QUEUE_BOOKS.labels("inline").inc(len(books) - queued)
+            logger.warning(f"Cua write-behind plena, es desen {len(books) - queued} llibres en línia")
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+        return list(books[queued:])
+
+    async def close(self) -> None:
+        """Buida la cua (com a molt `drain_timeout`) i atura el worker."""
+        if self._worker is None:
+            return
+        try:
+            async with asyncio.timeout(self.drain_timeout):
+                await self._queue.join()
+        except TimeoutError:
+            logger.error(f"Cua write-behind: {self._queue.qsize()} llibres sense desar en aturar")
+        self._worker.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._worker
+        self._worker = None
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            # Deixa que s'hi acumulin els llibres de les altres peticions en curs
+            if queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+                WRITE_QUEUE_DEPTH.set(queue.qsize())
+
+    async def _flush(self, batch: list[BookBase]) -> None:
+        """Desa un lot amb un sol upsert o, si falla, llibre a llibre."""
+        started = time.perf_counter()
+        saved = 0
+        try:
+            async with async_session_maker() as session:
+                repo = AsyncBookRepository(session)
+                try:
+                    await repo.bulk_upsert(batch)
+                    saved = len(batch)
+                except Exception as e:
+                    logger.warning(f"Error desant el lot write-behind, es processa d'un en un: {e}")
+                    for book_data in batch:
+                        try:
+                            await repo.create(book_data)
+                            saved += 1
+                        except Exception as error:
+                            logger.error(f"Error desant el llibre '{book_data.title}': {error}")
+        except Exception as e:
+            logger.error(f"Error de connexió desant el lot write-behind: {e}")
+        WRITE_QUEUE_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        WRITE_QUEUE_BOOKS.labels("saved").inc(saved)
+        WRITE_QUEUE_BOOKS.labels("failed").inc(len(batch) - saved)
+
+
+@lru_cache()
+def get_write_behind_queue() -> WriteBehindQueue | None:
+    """
+    Factory function que retorna la cua del procés, o None si està desactivada.
+    """
+    if not settings.write_behind_enabled:
+        return None
+    return WriteBehindQueue(
+        max_size=settings.write_behind_max_queue,
+        batch_size=settings.write_behind_batch_size,
+        flush_interval=settings.write_behind_flush_interval,
+        put_timeout=settings.write_behind_put_timeout,
+        drain_timeout=settings.write_behind_drain_timeout,
+    )
@@ -1,30 +1,202 @@
 """Servei de lògica de negoci per als llibres."""
 
+import asyncio
 import logging
+import math
+from collections.abc import AsyncIterator
+
 from fastapi import HTTPException
 
 from clients import GoogleBooksClient, get_google_books_client
-from crud import BookRepository
+from crud import AsyncBookRepository
 from models import Book
+from app.clients.rate_limit import RateLimitExceeded
+from app.clients.thumbnail_cache import CachedImage, ThumbnailCache, ThumbnailFetchError
+from app.core.config import settings
+from app.core.isbn import canonical_isbn, isbn_variants, normalize_isbn, same_isbn
+from app.core.metrics import stage
+from app.core.normalize import normalize_text
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+from app.crud.async_book_repository import LIST_COLUMNS, LIST_SORT_KEYS
+from app.crud.book_repository import BookRepository
+from app.schemas import BookPage, BookResponse, BookSearchResponse, FacetCount
+from app.services.write_behind import WriteBehindQueue
 
 logger = logging.getLogger(__name__)
 
+# Rang de la columna `books.id` (INTEGER)
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+# Longitud màxima d'un títol dins d'un cursor (prou gran per a qualsevol títol real)
+MAX_CURSOR_TEXT_LENGTH = 8192
+
 
 class BookService:
 
     def __init__(
         self, 
-        db_repo: BookRepository, 
-        google_client: GoogleBooksClient
+        db_repo: AsyncBookRepository, 
+        google_client: GoogleBooksClient,
+        write_queue: WriteBehindQueue | None = None,
+        thumbnails: ThumbnailCache | None = None,
     ):
 
         self.repo = db_repo
         self.google_client = google_client
+        self.write_queue = write_queue
+        self.thumbnails = thumbnails
+
+    async def search(
+        self, query: str, source: str = "auto", limit: int = 10, priority: str = "normal"
+    ) -> BookSearchResponse:
+        """
+        Cerca primer a la base de dades i només recorre a Google si cal.
+
+        Amb `source="auto"` es consulta Google quan la cerca local retorna
+        menys de `local_search_min_results` llibres. Si Google falla però
+        hi ha resultats locals, es retornen aquests. `priority` és la de la
+        petició a Google davant del limitador de quota.
+        """
+        local_books: list[Book] = []
+        if source in ("auto", "local"):
+            local_books = await self.repo.search_local(query, limit)
+            if source == "local" or len(local_books) >= settings.local_search_min_results:
+                return self._search_response(query, "local", local_books)
+
+        try:
+            google_books = await self.search_and_process(query, max_results=limit, priority=priority)
+        except HTTPException:
+            if not local_books:
+                raise
+            logger.warning(f"Google no disponible, es serveixen resultats locals per '{query}'")
+            return self._search_response(query, "local", local_books)
+
+        return self._search_response(query, "google", google_books[:limit])
+
+    async def list_books(
+        self,
+        sort: str = "id",
+        limit: int = 50,
+        cursor: str | None = None,
+        fields: list[str] | None = None,
+        language: str | None = None,
+        categories: str | None = None,
+        author: str | None = None,
+        author_id: int | None = None,
+        category_id: int | None = None,
+    ) -> BookPage:
+        """
+        Llista els llibres desats per pàgines amb un cursor opac.
+
+        Es demana una fila de més per saber si hi ha pàgina següent. L'`id` i
+        `updated_at` sempre formen part de la resposta; la resta de camps es
+        poden restringir amb `fields` (per exemple, per no transferir `description`).
+        """
+        if fields:
+            unknown = sorted(set(fields) - set(LIST_COLUMNS))
+            if unknown:
+                raise HTTPException(
+                    status_code=400, detail=f"Camps desconeguts: {', '.join(unknown)}"
+                )
+            fields = list(dict.fromkeys(["id", "updated_at", *fields]))
+
+        after = None
+        if cursor:
+            try:
+                after = self._cursor_key(decode_cursor(cursor, sort), sort)
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        rows = await self.repo.list_page(
+            sort=sort,
+            after=after,
+            limit=limit + 1,
+            fields=fields,
+            language=language,
+            # Es compara amb els noms normalitzats de la taula de categories
+            categories=normalize_text(categories) if categories else None,
+            author=author,
+            author_id=author_id,
+            category_id=category_id,
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, [last[name] for name in LIST_SORT_KEYS[sort]])
+        if fields:
+            rows = [{name: row[name] for name in fields} for row in rows]
+        return BookPage(books=rows, next_cursor=next_cursor)
+
+    async def get_book(self, book_id: int) -> Book:
+        """Retorna un llibre desat o 404."""
+        book = await self.repo.get_by_id(book_id)
+        if book is None:
+            raise HTTPException(status_code=404, detail="Llibre no trobat")
+        return book
+
+    async def list_facets(
+        self, facet: str, query: str | None = None, limit: int = 50
+    ) -> list[FacetCount]:
+        """
+        Llista autors o categories amb el nombre de llibres de cadascun.
+
+        `query` es normalitza com els noms desats i filtra per prefix, de
+        manera que "garcia" troba "García Márquez, Gabriel".
+        """
+        prefix = normalize_text(query) if query else None
+        rows = await self.repo.list_facets(facet, prefix=prefix, limit=limit)
+        return [FacetCount(**row) for row in rows]
+
+    @staticmethod
+    def _cursor_key(key: list, sort: str) -> list:
+        """
+        Comprova que la clau del cursor té la forma de l'ordenació i que
+        PostgreSQL en pot rebre els valors: l'id és un INTEGER de 32 bits i
+        el text no pot contenir NUL. Sense aquests límits, un cursor fet a
+        mà acabaria en un error de la base de dades (500) en lloc d'un 400.
+        """
+        expected = [str if name == "title" else int for name in LIST_SORT_KEYS[sort]]
+        if len(key) != len(expected) or not all(
+            type(value) is kind for value, kind in zip(key, expected)
+        ):
+            raise InvalidCursor("Cursor de paginació no vàlid")
+        for value in key:
+            if isinstance(value, int) and not INT32_MIN <= value <= INT32_MAX:
+                raise InvalidCursor("Cursor de paginació no vàlid")
+            if isinstance(value, str) and (len(value) > MAX_CURSOR_TEXT_LENGTH or "\x00" in value):
+                raise InvalidCursor("Cursor de paginació no vàlid")
+        return key
+
+    def _search_response(
+        self, query: str, source: str, books: list[Book]
+    ) -> BookSearchResponse:
+        return BookSearchResponse(
+            query=query,
+            total_results=len(books),
+            source=source,
+            books=[BookResponse.model_validate(book) for book in books],
+        )
 
-    async def search_and_process(self, query: str) -> list[Book]:
+    async def search_and_process(
+        self, query: str, max_results: int = 10, priority: str = "normal"
+    ) -> list[Book]:
+        """
+        Cerca a Google (amb la `priority` indicada davant de la quota) i desa els resultats.
 
+        Amb la cua write-behind activa es retornen els llibres de Google sense
+        esperar que es desin (encara sense `id`); només els que no hi caben
+        amb la cua plena es desen abans de respondre.
+        """
         try:
-            results = await self.google_client.search_books(query)
+            with stage("google"):
+                results = await self.google_client.search_books(query, max_results, priority)
+        except RateLimitExceeded as e:
+            logger.warning(f"Petició a Google Books descartada: {e}")
+            raise HTTPException(
+                status_code=429,
+                detail="Quota de Google Books exhaurida",
+                headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+            )
         except Exception as e:
             logger.error(f"Error cercant a Google Books: {e}")
             raise HTTPException(
@@ -38,11 +210,195 @@ class BookService:
                 detail="Llibres no trobats a Google"
             )
 
+        if self.write_queue is not None:
+            with stage("persist"):
+                pending = await self.write_queue.put(results)
+                if pending:
+                    await self._bulk_save(pending)
+            self._prefetch_thumbnails(results)
+            return results
+
+        with stage("persist"):
+            saved_books = await self._bulk_save(results)
+
+        if not saved_books:
+            raise HTTPException(
+                status_code=500,
+                detail="Error processant els llibres a la base de dades"
+            )
+
+        self._prefetch_thumbnails(saved_books)
+        return saved_books
+
+    def _prefetch_thumbnails(self, books: list[Book]) -> None:
+        """Descarrega en segon pla les miniatures, que els clients demanaran tot seguit."""
+        if self.thumbnails is not None:
+            self.thumbnails.prefetch(
+                url for book in books for url in (book.thumbnail, book.small_thumbnail)
+            )
+
+    async def get_thumbnail(self, book_id: int, size: str = "thumbnail") -> CachedImage:
+        """
+        Retorna la miniatura d'un llibre des de la cache a disc.
+
+        Si el llibre no té la mida demanada es fa servir l'altra. Només es
+        descarreguen URLs desades al catàleg: el proxy no és obert.
+        """
+        book = await self.get_book(book_id)
+        url = getattr(book, size) or book.thumbnail or book.small_thumbnail
+        if not url:
+            raise HTTPException(status_code=404, detail="El llibre no té miniatura")
+        try:
+            return await self.thumbnails.get(url)
+        except ThumbnailFetchError as e:
+            logger.warning(f"Miniatura del llibre {book_id} no disponible: {e}")
+            raise HTTPException(status_code=502, detail="No s'ha pogut obtenir la miniatura")
+
+    async def _bulk_save(self, results: list[Book]) -> list[Book]:
+        try:
+            # Camí ràpid: un sol INSERT ... ON CONFLICT i un sol commit per a tot el lot
+            return await self.repo.bulk_upsert(results)
+        except Exception as e:
+            logger.warning(f"Error desant el lot de llibres, es processen d'un en un: {e}")
+            return await self._save_one_by_one(results)
+
+    async def import_from_google(
+        self, query: str, max_results: int, priority: str = "normal"
+    ) -> dict:
+        """
+        Importa molts resultats de Google desant-los pàgina a pàgina.
+
+        Cada pàgina es persisteix amb un sol upsert en quant arriba, de
+        manera que no cal tenir tots els resultats en memòria.
+        """
+        fetched = 0
+        saved = 0
+        try:
+            async for page in self.google_client.iter_pages(
+                query, max_results, priority=priority
+            ):
+                fetched += len(page)
+                try:
+                    saved += len(await self.repo.bulk_upsert(page))
+                except Exception as e:
+                    logger.warning(f"Error desant una pàgina, es processa d'un en un: {e}")
+                    saved += len(await self._save_one_by_one(page))
+        except Exception as e:
+            logger.error(f"Error important de Google Books: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Error connectant amb Google Books"
+            )
+
+        return {"query": query, "fetched": fetched, "saved": saved}
+
+    async def lookup_isbns(
+        self, isbns: list[str], priority: str = "normal"
+    ) -> AsyncIterator[dict]:
+        """
+        Resol molts ISBN i genera una línia de resultat per a cadascun.
+
+        Primer es consulten tots a la base de dades amb una sola consulta.
+        Els que falten es demanen a Google amb `isbn:` i concurrència
+        limitada, i es desen per lots a mesura que arriben.
+        """
+        requested: list[str] = []
+        seen: set[str] = set()
+        for raw_isbn in isbns:
+            isbn = normalize_isbn(raw_isbn)
+            if isbn is None:
+                yield self._isbn_line(raw_isbn, "invalid")
+            # L'ISBN-10 i l'ISBN-13 d'un llibre es resolen un sol cop
+            elif canonical_isbn(isbn) not in seen:
+                seen.add(canonical_isbn(isbn))
+                requested.append(isbn)
+
+        candidates = [variant for isbn in requested for variant in isbn_variants(isbn)]
+        stored = {book.isbn: book for book in await self.repo.get_by_isbns(candidates)}
+
+        missing: list[str] = []
+        for isbn in requested:
+            book = next((stored[v] for v in isbn_variants(isbn) if v in stored), None)
+            if book is not None:
+                yield self._isbn_line(isbn, "found", book)
+            else:
+                missing.append(isbn)
+
+        semaphore = asyncio.Semaphore(settings.isbn_lookup_concurrency)
+
+        async def fetch(isbn: str) -> tuple[str, Book | None, Exception | None]:
+            async with semaphore:
+                try:
+                    results = await self.google_client.search_books(
+                        f"isbn:{isbn}", settings.isbn_lookup_candidates, priority
+                    )
+                except Exception as e:
+                    return isbn, None, e
+            # Google pot retornar primer una altra edició: només val el mateix ISBN
+            book_data = next((book for book in results if same_isbn(isbn, book.isbn)), None)
+            return isbn, book_data, None
+
+        tasks = [asyncio.ensure_future(fetch(isbn)) for isbn in missing]
+        batch: list[tuple[str, Book]] = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                isbn, book_data, error = await next_done
+                if error is not None:
+                    logger.error(f"Error cercant l'ISBN {isbn} a Google Books: {error}")
+                    yield self._isbn_line(isbn, "error")
+                elif book_data is None:
+                    yield self._isbn_line(isbn, "not_found")
+                else:
+                    batch.append((isbn, book_data))
+
+                if len(batch) >= settings.isbn_lookup_persist_batch:
+                    for line in await self._persist_isbn_batch(batch):
+                        yield line
+                    batch = []
+
+            if batch:
+                for line in await self._persist_isbn_batch(batch):
+                    yield line
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _persist_isbn_batch(self, batch: list[tuple[str, Book]]) -> list[dict]:
+        """Desa un lot de llibres obtinguts de Google i en genera les línies."""
+        try:
+            saved = await self.repo.bulk_upsert([book_data for _, book_data in batch])
+            by_key = {book.normalized_key: book for book in saved}
+            persisted = [
+                by_key.get(BookRepository.build_normalized_key(book_data.title, book_data.author))
+                for _, book_data in batch
+            ]
+        except Exception as e:
+            logger.warning(f"Error desant el lot d'ISBN, es processen d'un en un: {e}")
+            persisted = []
+            for _, book_data in batch:
+                saved_books = await self._save_one_by_one([book_data])
+                persisted.append(saved_books[0] if saved_books else None)
+
+        return [
+            self._isbn_line(isbn, "fetched", book) if book else self._isbn_line(isbn, "error")
+            for (isbn, _), book in zip(batch, persisted)
+        ]
+
+    @staticmethod
+    def _isbn_line(isbn: str, status: str, book: Book | None = None) -> dict:
+        return {
+            "isbn": isbn,
+            "status": status,
+            "book": BookResponse.model_validate(book).model_dump(mode="json") if book else None,
+        }
+
+    async def _save_one_by_one(self, results: list[Book]) -> list[Book]:
+        """Desa els llibres individualment perquè un error no aturi la resta."""
         saved_books = []
         for book_data in results:
             try:
                 # Intenta crear el llibre (o obtenir l'existent)
-                saved_book = self.repo.create(book_data)
+                saved_book = await self.repo.create(book_data)
                 if saved_book:
                     saved_books.append(saved_book)
                     logger.info(f"Llibre processat: {saved_book.title}")
@@ -50,11 +406,4 @@ class BookService:
                 logger.error(f"Error processant llibre '{book_data.title}': {e}")
                 # Continua amb el següent llibre
                 continue
-
-        if not saved_books:
-            raise HTTPException(
-                status_code=500,
-                detail="Error processant els llibres a la base de dades"
-            )
-
         return saved_books
@@ -0,0 +1 @@
+"""Benchmarks i comprovacions de rendiment."""
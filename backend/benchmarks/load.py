@@ -0,0 +1,93 @@
+"""
+Càrrega HTTP contra un servidor en marxa, per comparar modes de desplegament.
+
+A diferència de `benchmarks.suite`, que crida l'aplicació dins del mateix
+procés, aquí les peticions passen per la xarxa i pel servidor (uvicorn o
+gunicorn amb N workers). Fa servir el catàleg que ja hi hagi a la base de
+dades: convé omplir-lo abans (per exemple, important un CSV).
+
+Ús (des de backend/):
+    python -m benchmarks.load --url http://localhost:8000 --requests 2000 --concurrency 64
+    python -m benchmarks.load --output w4.json --compare w1.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import asdict
+
+import httpx
+
+from benchmarks.stub_google import load_fixture_items
+from benchmarks.suite import measure, print_results
+
+# Etapa -> (ruta, paràmetres en funció d'una paraula dels fixtures)
+STAGES = {
+    "status": ("/", lambda word: {}),
+    "list_books": ("/api/v1/books", lambda word: {"limit": 50, "fields": "title,author"}),
+    "search_local": (
+        "/api/v1/books/search",
+        lambda word: {"q": word, "source": "local", "limit": 10},
+    ),
+}
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    rnd = random.Random(args.seed)
+    words = sorted({
+        word.lower()
+        for item in load_fixture_items()
+        for word in item["volumeInfo"].get("title", "").split()
+        if len(word) > 4
+    })
+    # Caducitat per sota del keep-alive del servidor (5 s): si no, es reutilitzen connexions que ja ha tancat
+    limits = httpx.Limits(
+        max_connections=args.concurrency,
+        max_keepalive_connections=args.concurrency,
+        keepalive_expiry=2,
+    )
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as http:
+        for stage in args.stages:
+            path, params = STAGES[stage]
+
+            async def get(word: str) -> None:
+                response = await http.get(path, params=params(word))
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} ha respost {response.status_code}: {response.text[:200]}")
+
+            # Escalfa connexions i caches abans de mesurar
+            await asyncio.gather(*(get(rnd.choice(words)) for _ in range(args.concurrency)))
+            result = await measure(
+                stage, None, get, [rnd.choice(words) for _ in range(args.requests)],
+                concurrency=args.concurrency,
+            )
+            results.append(asdict(result))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--requests", type=int, default=2000, help="Peticions per etapa")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fitxer JSON on desar els resultats")
+    parser.add_argument("--compare", help="Resultats JSON anteriors per comparar")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"url": args.url, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Micro-benchmark de `normalize_text` contra la implementació anterior.
+
+Abans de mesurar comprova que les dues versions donen exactament el mateix
+resultat per a cada punt de codi Unicode per separat i per a textos
+aleatoris que barregen ASCII, lletres accentuades, marques combinants,
+puntuació i espais Unicode.
+
+Ús (des de backend/):
+    python -m benchmarks.normalize_text [--samples 200000] [--seed 0]
+"""
+
+import argparse
+import random
+import re
+import sys
+import timeit
+import unicodedata
+
+from app.core.normalize import normalize_text
+
+
+def legacy_normalize_text(text: str) -> str:
+    """Còpia congelada de `BookRepository._normalize_text` abans d'optimitzar-la."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = unicodedata.normalize('NFC', text)
+    text = re.sub(r'[!?¿¡.,;:\(\)\[\]{}"\']+', '', text)
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+# Alfabet dels textos aleatoris: casos habituals i casos límit
+_ALPHABET = (
+    list("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+    + list('!?¿¡.,;:()[]{}"\'-_/&')
+    + list(" \t\n\r\x0b\x0c\x1c\x1f\x85\xa0 　")
+    + list("àáèéíïòóúüçñÀÉÍÒÚÇÑłøßæœİıĳǅ")
+    + [chr(code) for code in range(0x0300, 0x0370)]  # marques combinants
+    + list("ΑΩάώДжйЁ한국어각ﬁ①ⅫKΩ\U0001d400")
+)
+
+
+def _random_text(rnd: random.Random) -> str:
+    return "".join(rnd.choices(_ALPHABET, k=rnd.randint(0, 40)))
+
+
+def check_equivalence(samples: int, seed: int) -> None:
+    """Falla amb un contraexemple si les dues implementacions divergeixen."""
+    for code in range(sys.maxunicode + 1):
+        char = chr(code)
+        for text in (char, f"A{char}b", f"{char}.{char}"):
+            if normalize_text(text) != legacy_normalize_text(text):
+                raise AssertionError(f"Divergència per {text!r} (U+{code:04X})")
+
+    rnd = random.Random(seed)
+    for _ in range(samples):
+        text = _random_text(rnd)
+        if normalize_text(text) != legacy_normalize_text(text):
+            raise AssertionError(f"Divergència per {text!r}")
+    normalize_text.cache_clear()
+    print(f"Equivalència comprovada: {sys.maxunicode + 1} punts de codi, {samples} textos aleatoris")
+
+
+def _per_call(fn, texts: list[str], repeat: int = 5) -> float:
+    """Millor temps per crida en microsegons."""
+    best = min(timeit.repeat(lambda: [fn(text) for text in texts], number=1, repeat=repeat))
+    return best / len(texts) * 1e6
+
+
+def run_benchmark() -> None:
+    rnd = random.Random(1)
+    words = ["casa", "llibre", "ombra", "vent", "History", "Harry", "Potter", "Joan", "Maria"]
+    ascii_texts = [f"{' '.join(rnd.choices(words, k=4))}: vol. {i}!" for i in range(20000)]
+    accented = [f"L'ombra del vent ({i}) — Carlos Ruiz Zafón, Èdició ¿especial?" for i in range(20000)]
+
+    uncached = normalize_text.__wrapped__
+    cases = [
+        ("ASCII", ascii_texts),
+        ("accentuat", accented),
+    ]
+    print(f"{'cas':<12}{'anterior':>12}{'nova':>12}{'nova+cache':>14}")
+    for name, texts in cases:
+        legacy = _per_call(legacy_normalize_text, texts)
+        fast = _per_call(uncached, texts)
+        normalize_text.cache_clear()
+        for text in texts:
+            normalize_text(text)
+        cached = _per_call(normalize_text, texts)
+        print(f"{name:<12}{legacy:>10.2f}µs{fast:>10.2f}µs{cached:>12.2f}µs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--samples", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    check_equivalence(args.samples, args.seed)
+    run_benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Servidor local que imita l'endpoint `volumes` de Google Books.
+
+Serveix els fixtures de `benchmarks/fixtures/` sense accés a la xarxa.
+Cada consulta rep els mateixos volums amb el títol marcat amb la consulta
+i la posició, de manera que consultes diferents generen llibres nous i una
+consulta repetida genera duplicats, com passaria amb Google.
+
+Ús:
+    python -m benchmarks.stub_google serve --port 8765
+    python -m benchmarks.stub_google record "harry potter" > fixtures/volumes_hp.json
+"""
+
+import argparse
+import copy
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+VOLUMES_PATH = "/books/v1/volumes"
+
+
+def load_fixture_items(fixtures_dir: Path = FIXTURES_DIR) -> list[dict]:
+    """Tots els volums dels fixtures, en ordre de fitxer."""
+    items = []
+    for path in sorted(fixtures_dir.glob("volumes_*.json")):
+        items.extend(json.loads(path.read_text(encoding="utf-8")).get("items", []))
+    if not items:
+        raise RuntimeError(f"No hi ha fixtures a {fixtures_dir}")
+    return items
+
+
+class StubGoogleBooks:
+    """
+    Servidor HTTP en un fil que respon com `GET /books/v1/volumes`.
+
+    `total_items` limita el nombre de resultats per consulta; més enllà
+    es retorna una pàgina buida, igual que Google.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, total_items: int = 200):
+        self.items = load_fixture_items()
+        self.total_items = total_items
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive com Google, perquè el pool de connexions del client es comporti igual
+            protocol_version = "HTTP/1.1"
+
+            def do_HEAD(self):
+                self.send_response(200 if urlparse(self.path).path == VOLUMES_PATH else 404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != VOLUMES_PATH:
+                    self.send_error(404)
+                    return
+                stub.requests += 1
+                params = parse_qs(url.query)
+                body = json.dumps(
+                    stub.page(
+                        params.get("q", [""])[0],
+                        int(params.get("startIndex", ["0"])[0]),
+                        int(params.get("maxResults", ["10"])[0]),
+                    ),
+                    ensure_ascii=False,
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{VOLUMES_PATH}"
+
+    def page(self, query: str, start_index: int, max_results: int) -> dict:
+        """Pàgina de resultats per a la consulta, en format de Google."""
+        end = min(start_index + max(0, min(max_results, 40)), self.total_items)
+        items = []
+        for position in range(start_index, end):
+            item = copy.deepcopy(self.items[position % len(self.items)])
+            item["volumeInfo"]["title"] = f"{item['volumeInfo']['title']} ({query} {position})"
+            items.append(item)
+        page = {"kind": "books#volumes", "totalItems": self.total_items}
+        if items:
+            page["items"] = items
+        return page
+
+    def start(self) -> "StubGoogleBooks":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "StubGoogleBooks":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def record(query: str, max_results: int, api_key: str | None) -> dict:
+    """Desa una resposta real de Google per fer-la servir com a fixture."""
+    import httpx
+
+    params = {"q": query, "maxResults": max_results}
+    if api_key:
+        params["key"] = api_key
+    response = httpx.get("https://www.googleapis.com/books/v1/volumes", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stub local de Google Books")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serveix els fixtures")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--total-items", type=int, default=200)
+
+    rec = commands.add_parser("record", help="Grava una resposta real de Google a stdout")
+    rec.add_argument("query")
+    rec.add_argument("--max-results", type=int, default=40)
+    rec.add_argument("--api-key")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        json.dump(record(args.query, args.max_results, args.api_key), sys.stdout, ensure_ascii=False, indent=2)
+        return
+
+    stub = StubGoogleBooks(port=args.port, total_items=args.total_items)
+    print(f"Stub de Google Books a {stub.url}", file=sys.stderr)
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
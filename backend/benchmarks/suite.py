@@ -0,0 +1,300 @@
+"""
+Suite de benchmarks dels camins calents: parseig, deduplicació i cerca.
+
+S'executa sense xarxa: Google Books se substitueix per `stub_google` amb els
+fixtures de `benchmarks/fixtures/`, i es fa servir una base de dades
+PostgreSQL d'un sol ús (`<POSTGRES_DB>_bench_<pid>`) que es crea al
+principi i s'esborra al final. Per a cada etapa i mida de catàleg es
+mesura p50/p99, peticions per segon i memòria (pic d'assignacions de
+Python amb tracemalloc i RSS del procés).
+
+Ús (des de backend/, amb les variables POSTGRES_* o el fitxer .env):
+    python -m benchmarks.suite --sizes 1000 10000 100000 --output results.json
+    python -m benchmarks.suite --output new.json --compare results.json
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+
+from dotenv import dotenv_values
+from sqlalchemy import URL, create_engine, text
+
+from benchmarks.stub_google import StubGoogleBooks, load_fixture_items
+
+# Operacions de la passada amb tracemalloc (el traçat alenteix massa per mesurar latència)
+MEMORY_SAMPLE = 50
+
+
+@dataclass
+class StageResult:
+    """Resultat d'una etapa per a una mida de catàleg."""
+    stage: str
+    catalog_size: int | None
+    ops: int
+    concurrency: int
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+    rps: float
+    peak_alloc_kb: float
+    rss_mb: float
+
+
+def _rss_mb() -> float:
+    """Memòria resident actual del procés (Linux) o el pic si no hi ha /proc."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measure(
+    stage: str,
+    catalog_size: int | None,
+    op,
+    inputs: list,
+    concurrency: int = 1,
+) -> StageResult:
+    """Executa `op` per a cada entrada i en resumeix la latència i la memòria."""
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(item) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            result = op(item)
+            if inspect.isawaitable(result):
+                await result
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(item) for item in inputs))
+    wall = time.perf_counter() - started
+
+    tracemalloc.start()
+    await asyncio.gather(*(timed(item) for item in inputs[:MEMORY_SAMPLE]))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = latencies[: len(inputs)]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return StageResult(
+        stage=stage,
+        catalog_size=catalog_size,
+        ops=len(inputs),
+        concurrency=concurrency,
+        p50_ms=round(cuts[49] * 1000, 3),
+        p99_ms=round(cuts[98] * 1000, 3),
+        mean_ms=round(statistics.fmean(latencies) * 1000, 3),
+        rps=round(len(inputs) / wall, 1),
+        peak_alloc_kb=round(peak / 1024, 1),
+        rss_mb=round(_rss_mb(), 1),
+    )
+
+
+def _database_config() -> dict:
+    """Variables POSTGRES_* de l'entorn o, si no hi són, del fitxer .env."""
+    config = {key.upper(): value for key, value in dotenv_values(".env").items()}
+    config.update({key.upper(): value for key, value in os.environ.items()})
+    return config
+
+
+def _admin_engine(config: dict):
+    url = URL.create(
+        "postgresql",
+        username=config["POSTGRES_USER"],
+        password=config.get("POSTGRES_PASSWORD"),
+        host=config.get("POSTGRES_HOST", "db"),
+        port=int(config.get("POSTGRES_PORT", 5432)),
+        database=config["POSTGRES_DB"],
+    )
+    return create_engine(url, isolation_level="AUTOCOMMIT")
+
+
+class Catalog:
+    """Omple el catàleg fins a cada mida amb llibres derivats dels fixtures."""
+
+    def __init__(self, engine, parse_book, build_key):
+        self.engine = engine
+        self.books = [parse_book(item) for item in load_fixture_items()]
+        self.build_key = build_key
+        self.size = 0
+
+    def book(self, index: int) -> dict:
+        """Llibre sintètic `index`: títol únic, la resta de camps del fixture."""
+        base = self.books[index % len(self.books)]
+        title = f"{base.title} #{index}"
+        return {
+            **base.model_dump(),
+            "title": title,
+            "normalized_key": self.build_key(title, base.author),
+        }
+
+    def grow_to(self, size: int, batch_size: int = 5000) -> None:
+        from app.models import Book
+
+        with self.engine.begin() as connection:
+            for start in range(self.size, size, batch_size):
+                rows = [self.book(i) for i in range(start, min(size, start + batch_size))]
+                connection.execute(Book.__table__.insert(), rows)
+            connection.execute(text("ANALYZE books"))
+        self.size = max(self.size, size)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # L'app llegeix la configuració en importar-se: primer cal apuntar a la BD temporal
+    from httpx import ASGITransport, AsyncClient
+    from sqlmodel import Session
+
+    from app.clients import get_google_books_client
+    from app.core.db import async_engine, create_db_and_tables, engine
+    from app.crud.book_repository import BookRepository
+    from app.main import app
+
+    create_db_and_tables()
+    client = get_google_books_client()
+    catalog = Catalog(engine, client._parse_book, BookRepository.build_normalized_key)
+    rnd = random.Random(args.seed)
+    results: list[StageResult] = []
+
+    items = load_fixture_items()
+    results.append(await measure("parse_book", None, client._parse_book, rnd.choices(items, k=args.parse_ops)))
+
+    words = sorted({word.lower() for book in catalog.books for word in book.title.split() if len(word) > 4})
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as http:
+        async def get(url: str, params: dict) -> None:
+            response = await http.get(url, params=params)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} ha respost {response.status_code}: {response.text[:200]}")
+
+        for size in args.sizes:
+            catalog.grow_to(size)
+            queries = [
+                catalog.book(rnd.randrange(size)) if rnd.random() < 0.5
+                else {"title": f"Inexistent {n}", "author": "Ningú"}
+                for n in range(args.requests)
+            ]
+            with Session(engine) as session:
+                repo = BookRepository(session)
+                results.append(await measure(
+                    "find_by_title_author", size,
+                    lambda book: repo.find_by_title_author(book["title"], book["author"]),
+                    queries,
+                ))
+
+            results.append(await measure(
+                "search_local", size,
+                lambda q: get("/api/v1/books/search", {"q": q, "source": "local", "limit": 10}),
+                [rnd.choice(words) for _ in range(args.requests)],
+                concurrency=args.concurrency,
+            ))
+            results.append(await measure(
+                "search_by_title", size,
+                lambda q: get("/api/v1/google/search-by-title", {"title": q, "max_results": 40}),
+                [f"bench {size} {n}" for n in range(args.requests)],
+                concurrency=args.concurrency,
+            ))
+
+    await client.close()
+    await async_engine.dispose()
+    engine.dispose()
+    return {"results": [asdict(result) for result in results]}
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[dict], baseline: list[dict] | None = None) -> None:
+    """Taula de resultats; amb `baseline`, la variació de p50, p99 i rps."""
+    previous = {(r["stage"], r["catalog_size"]): r for r in baseline or []}
+    print(f"{'etapa':<22}{'catàleg':>9}{'p50 ms':>10}{'p99 ms':>10}{'rps':>10}{'pic KB':>10}{'RSS MB':>9}")
+    for r in results:
+        line = (
+            f"{r['stage']:<22}{r['catalog_size'] or '-':>9}{r['p50_ms']:>10.2f}"
+            f"{r['p99_ms']:>10.2f}{r['rps']:>10.0f}{r['peak_alloc_kb']:>10.0f}{r['rss_mb']:>9.0f}"
+        )
+        old = previous.get((r["stage"], r["catalog_size"]))
+        if old:
+            deltas = [
+                f"{name} {(r[key] - old[key]) / old[key] * 100:+.0f}%"
+                for name, key in (("p50", "p50_ms"), ("p99", "p99_ms"), ("rps", "rps"))
+                if old[key]
+            ]
+            line += "   " + ", ".join(deltas)
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=300, help="Operacions per etapa")
+    parser.add_argument("--parse-ops", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Fitxer JSON on desar els resultats")
+    parser.add_argument("--compare", help="Resultats JSON anteriors per comparar")
+    args = parser.parse_args()
+    args.sizes = sorted(args.sizes)
+
+    config = _database_config()
+    bench_db = f"{config['POSTGRES_DB']}_bench_{os.getpid()}"
+    admin = _admin_engine(config)
+    with admin.connect() as connection:
+        server_version = connection.execute(text("SHOW server_version")).scalar()
+        connection.execute(text(f'CREATE DATABASE "{bench_db}"'))
+
+    stub = StubGoogleBooks(total_items=40).start()
+    os.environ.update({
+        "POSTGRES_DB": bench_db,
+        "GOOGLE_BOOKS_BASE_URL": stub.url,
+        "GOOGLE_CACHE_BACKEND": "none",
+        "GOOGLE_MAX_RETRIES": "0",
+    })
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        stub.stop()
+        with admin.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{bench_db}" WITH (FORCE)'))
+        admin.dispose()
+
+    report["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "postgres": server_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    print_results(report["results"], baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,17 @@
 # Salir inmediatamente si hay un error
 set -e
 
-#  Correr migraciones en el futuro.
+# Migraciones una sola vez, antes de arrancar los workers
+echo "Aplicando migraciones..."
+python -m app.cli migrate
+
+if [ "${APP_ENV:-development}" = "production" ]; then
+    echo "Iniciando Gunicorn con workers de Uvicorn..."
+    # exec: Gunicorn recibe las señales del contenedor (SIGTERM para parar, SIGHUP para reiniciar workers)
+    exec gunicorn app.main:app -c gunicorn.conf.py
+fi
 
 echo "Iniciando servidor Uvicorn..."
 
 # Lanza la app en el puerto 8000 y permite recarga en caliente (reload)
-uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
@@ -0,0 +1,49 @@
+"""Configuració de gunicorn per al mode de producció (`APP_ENV=production`).
+
+Gunicorn gestiona els workers d'uvicorn: en reinicia un si mor i, amb
+`kill -HUP`, els substitueix un a un sense tallar peticions en curs.
+Uvicorn fa servir uvloop i httptools si estan instal·lats (`uvicorn[standard]`).
+"""
+
+import os
+import shutil
+
+from app.core.config import settings
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+# Un worker per nucli: cada worker és un event loop amb el seu pool de connexions
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Temps per acabar les peticions en curs i buidar la cua write-behind en aturar
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", settings.write_behind_drain_timeout + 10))
+# Un worker que no respon durant aquest temps es reinicia
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+# Recicla cada worker després de N peticions (0 = mai), amb jitter per no reiniciar-los alhora
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+# Mètriques de tots els workers: cada procés escriu els seus valors en fitxers
+# d'aquest directori i /metrics els agrega. S'ha de fixar abans de crear els workers.
+if settings.metrics_enabled:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/booktracker_prometheus")
+
+
+def on_starting(server):
+    """Buida els fitxers de mètriques d'una execució anterior."""
+    multiproc_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        shutil.rmtree(multiproc_dir, ignore_errors=True)
+        os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    """Deixa de sumar els gauges d'un worker que ha acabat."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,8 @@
+"""Configuració comuna dels tests."""
+
+import os
+
+# `Settings` exigeix les credencials de la base de dades; els tests unitaris no s'hi connecten
+os.environ.setdefault("POSTGRES_USER", "test")
+os.environ.setdefault("POSTGRES_PASSWORD", "test")
+os.environ.setdefault("POSTGRES_DB", "test")
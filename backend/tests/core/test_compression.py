@@ -0,0 +1,73 @@
+"""Compressió de respostes segons `Accept-Encoding` i el tipus de contingut."""
+
+import gzip
+
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, is_incompressible
+
+BODY = b'{"title": "L\'ombra del vent"}' * 200
+PNG = b"\\x89PNG\\r\\n\\x1a\\n" + bytes(range(256)) * 20
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    image_path = tmp_path_factory.mktemp("thumbs") / "cover.jpg"
+    image_path.write_bytes(PNG)
+
+    routes = [
+        Route("/json", lambda request: Response(BODY, media_type="application/json")),
+        Route("/png", lambda request: Response(PNG, media_type="image/png")),
+        Route("/icon", lambda request: Response(PNG, media_type="image/vnd.microsoft.icon")),
+        Route("/zip", lambda request: Response(PNG, media_type="application/zip")),
+        Route("/thumbnail", lambda request: FileResponse(image_path, media_type="image/jpeg")),
+    ]
+    app = CompressionMiddleware(Starlette(routes=routes), minimum_size=1000)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+def test_compresses_json(client, encoding):
+    response = client.get("/json", headers={"Accept-Encoding": encoding})
+    assert response.headers["content-encoding"] == encoding
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("encoding", ["br", "gzip"])
+@pytest.mark.parametrize("path", ["/png", "/icon", "/zip", "/thumbnail"])
+def test_skips_incompressible_types(client, encoding, path):
+    response = client.get(path, headers={"Accept-Encoding": encoding})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert response.headers["content-length"] == str(len(PNG))
+    assert response.content == PNG
+
+
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_compressed_body_round_trips(client, encoding, decompress):
+    # `response.content` ja ve descomprimit per httpx: es llegeix el cos en brut
+    with client.stream("GET", "/json", headers={"Accept-Encoding": encoding}) as response:
+        assert decompress(b"".join(response.iter_raw())) == BODY
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ("image/jpeg", True),
+        ("image/svg+xml", True),
+        ("video/mp4", True),
+        ("application/gzip", True),
+        ("application/json", False),
+        ("application/x-ndjson; charset=utf-8", False),
+        ("text/csv", False),
+        ("", False),
+    ],
+)
+def test_is_incompressible(content_type, expected):
+    assert is_incompressible(content_type) is expected
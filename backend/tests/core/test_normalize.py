@@ -0,0 +1,59 @@
+"""Equivalència de `normalize_text` amb la implementació anterior."""
+
+import re
+import unicodedata
+
+from hypothesis import example, given
+from hypothesis import strategies as st
+
+from app.core.normalize import normalize_text
+
+
+def legacy_normalize_text(text: str) -> str:
+    """Còpia congelada de `BookRepository._normalize_text` abans d'optimitzar-la."""
+    if not text:
+        return ""
+    text = text.lower()
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    text = unicodedata.normalize('NFC', text)
+    text = re.sub(r'[!?¿¡.,;:\(\)\[\]{}"\']+', '', text)
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+# Caràcters que exerciten cada branca: marques combinants (també astrals),
+# puntuació eliminada, espais Unicode i lletres fora del pla bàsic
+_EDGE_CHARACTERS = st.sampled_from(
+    list('!?¿¡.,;:()[]{}"\'')
+    + list(" \t\n\x0b\x0c\x1c\x85\xa0 　")
+    + [chr(code) for code in range(0x0300, 0x0370)]
+    + ["\U0001d167", "\U0001e944", "\U000e0100", "\U00011001"]
+    + list("àÉİıﬁǅΩ한\U0001d400\U0001f600")
+)
+
+
+@given(st.text())
+@example("")
+@example("L'ombra del vent: edició ¿especial?")
+@example("!?¿¡.,;:()[]{}\"'")
+@example("  ...  ")
+@example("ȩ́ a\U0001d167b")
+@example("\U0001d400\U0001f600 \U000e0100")
+def test_matches_legacy(text):
+    assert normalize_text(text) == legacy_normalize_text(text)
+
+
+@given(st.text(alphabet=st.one_of(_EDGE_CHARACTERS, st.characters()), max_size=30))
+def test_matches_legacy_on_edge_characters(text):
+    assert normalize_text(text) == legacy_normalize_text(text)
+
+
+@given(st.text(alphabet=st.characters(min_codepoint=0x10000)))
+def test_matches_legacy_on_astral_text(text):
+    assert normalize_text(text) == legacy_normalize_text(text)
+
+
+@given(st.text(alphabet='!?¿¡.,;:()[]{}"\' \t\n'))
+def test_punctuation_only_text_is_empty(text):
+    assert normalize_text(text) == legacy_normalize_text(text) == ""